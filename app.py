@@ -1,24 +1,103 @@
 import streamlit as st
 import time
+import hashlib
+import json
+import os
+import uuid
+from functools import partial
+APP_STARTED = time.perf_counter()
 from ec2_launcher import (
-    get_latest_ubuntu_ami, launch_instance,
-    get_key_pairs, get_security_groups, get_subnets, get_iam_roles,
-    get_recent_ubuntu_amis, get_recent_amazon_linux_amis,
-    get_recent_rhel_amis, get_recent_windows_amis, get_recent_macos_amis,
-    create_key_pair, stop_instance, terminate_instance
+    submit_launch_job, get_launch_job, JOB_DONE_STATUSES,
+    configure_warm_pool, drain_warm_pool, get_warm_pool_stats, warm_profile_id, preflight_launch,
+    AMI_FAMILIES, ROOT_VOLUME_TYPES, PROVISIONED_IOPS_VOLUME_TYPES,
+    create_key_pair, stop_instance, terminate_instance, bulk_instance_action, find_instances_by_tags, invalidate_cache,
+    get_enabled_regions, scan_regions,
+    submit_parallel, iter_parallel, PRIORITY_BACKGROUND, set_api_scope, get_scope_timings
 )
-try:
-    from streamlit_lottie import st_lottie
-except ImportError:
-    st.warning("Install streamlit-lottie for animations: pip install streamlit-lottie")
-    st_lottie = None
-import requests
+from inventory_snapshot import SNAPSHOT_DIR, snapshot_lookup, invalidate_snapshot, refresh_errors
+from resource_fetch import start_resource_fetch, collect_resources
+import metrics
+
+# Fast start skips decorative delays; set EC2_LAUNCHER_FAST_START=0 to bring the typing effect back
+FAST_START = os.environ.get("EC2_LAUNCHER_FAST_START", "1") != "0"
+LOTTIE_TIMEOUT = 3
+LOTTIE_WAIT = 0.3
+LOTTIE_RETRY_AFTER = 600
+ASSET_CACHE_DIR = os.path.join(SNAPSHOT_DIR, "assets")
+METRICS_PORT = os.environ.get("EC2_LAUNCHER_METRICS_PORT")
+
+if METRICS_PORT:
+    # Prometheus text on /metrics, JSON on /metrics.json
+    metrics.serve_metrics(int(METRICS_PORT))
+# Every AWS call this rerun makes, on this thread or on pool workers it hands work to, is timed under its ID
+RERUN_ID = uuid.uuid4().hex
+set_api_scope(RERUN_ID)
+
+@st.cache_resource
+def asset_store():
+    from concurrent.futures import ThreadPoolExecutor
+    return {
+        "executor": ThreadPoolExecutor(max_workers=2, thread_name_prefix="ec2-assets"),
+        "loaded": {}, "pending": {}, "retry_at": {},
+    }
 
 def load_lottieurl(url):
-    r = requests.get(url)
+    # Runs off the script thread: disk copy first, then the CDN with a timeout
+    cache_path = os.path.join(ASSET_CACHE_DIR, hashlib.sha1(url.encode()).hexdigest() + ".json")
+    try:
+        with open(cache_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+    import requests
+    try:
+        r = requests.get(url, timeout=LOTTIE_TIMEOUT)
+    except requests.RequestException:
+        return None
     if r.status_code != 200:
         return None
-    return r.json()
+    data = r.json()
+    try:
+        os.makedirs(ASSET_CACHE_DIR, exist_ok=True)
+        with open(cache_path, "w") as f:
+            json.dump(data, f)
+    except OSError:
+        pass
+    return data
+
+def lottie_asset(url, wait=0):
+    store = asset_store()
+    if url in store["loaded"]:
+        # A failed fetch is remembered as None, so reruns skip the wait until it is due for a retry
+        data = store["loaded"][url]
+        if data is not None or time.monotonic() < store["retry_at"].get(url, 0):
+            return data
+        del store["loaded"][url]
+    future = store["pending"].get(url)
+    if future is None:
+        future = store["pending"][url] = store["executor"].submit(load_lottieurl, url)
+    try:
+        data = future.result(timeout=wait)
+    except Exception:
+        if not future.done():
+            return None
+        data = None
+    store["pending"].pop(url, None)
+    store["loaded"][url] = data
+    if data is None:
+        store["retry_at"][url] = time.monotonic() + LOTTIE_RETRY_AFTER
+    return data
+
+def render_lottie(slot, data, **kwargs):
+    if data is None:
+        return
+    try:
+        from streamlit_lottie import st_lottie
+    except ImportError:
+        slot.warning("Install streamlit-lottie for animations: pip install streamlit-lottie")
+        return
+    with slot.container():
+        st_lottie(data, **kwargs)
 
 st.markdown('''
     <style>
@@ -47,12 +126,14 @@ st.markdown('''
 ''', unsafe_allow_html=True)
 
 lottie_url = "https://assets2.lottiefiles.com/packages/lf20_Stt1Rk.json"
-lottie_json = load_lottieurl(lottie_url)
+success_lottie_url = "https://assets2.lottiefiles.com/packages/lf20_kkflmtur.json"
 
 st.set_page_config(page_title="EC2 Instance Launcher", layout="centered")
 
-if st_lottie and lottie_json:
-    st_lottie(lottie_json, height=180, key="cloud-anim")
+# The header animation is filled in at the end of the run so it never holds up first paint
+header_slot = st.empty()
+lottie_asset(lottie_url)
+lottie_asset(success_lottie_url)
 
 placeholder_title = st.empty()
 def animated_typing(text, speed=0.06):
@@ -61,7 +142,32 @@ def animated_typing(text, speed=0.06):
         displayed += char
         placeholder_title.markdown(f"<div class='main-title'>{displayed}</div>", unsafe_allow_html=True)
         time.sleep(speed)
-animated_typing("🚀 Interactive EC2 Launcher Panel", speed=0.07)
+title_text = "🚀 Interactive EC2 Launcher Panel"
+if FAST_START or st.session_state.get("title_typed"):
+    placeholder_title.markdown(f"<div class='main-title'>{title_text}</div>", unsafe_allow_html=True)
+else:
+    animated_typing(title_text, speed=0.07)
+    st.session_state["title_typed"] = True
+first_paint_ms = (time.perf_counter() - APP_STARTED) * 1000
+
+def aws_timing_rows(scope):
+    return [
+        {"Service": service, "Operation": operation, "Calls": count, "Total ms": round(seconds * 1000, 1)}
+        for (service, operation), (count, seconds) in sorted(get_scope_timings(scope).items())
+    ]
+
+def finish_render():
+    render_lottie(header_slot, lottie_asset(lottie_url, wait=LOTTIE_WAIT), height=180, key="cloud-anim")
+    if st.sidebar.checkbox("Show AWS timing panel", key="show_timing_panel"):
+        st.sidebar.caption("AWS calls this page render has made so far, including lookups run on worker threads")
+        st.sidebar.dataframe(aws_timing_rows(RERUN_ID))
+        st.sidebar.download_button("Download metrics (JSON)", metrics.dump_json(), file_name="ec2_launcher_metrics.json")
+    interactive_ms = (time.perf_counter() - APP_STARTED) * 1000
+    st.session_state.setdefault("first_interactive_ms", interactive_ms)
+    st.caption(
+        f"⏱️ First paint {first_paint_ms:.0f} ms · interactive {interactive_ms:.0f} ms "
+        f"(first load this session {st.session_state['first_interactive_ms']:.0f} ms)"
+    )
 
 st.markdown("""
 <div style='display:flex;align-items:center;font-family:Montserrat,sans-serif;font-size:1.25rem;font-weight:700;color:#e67e22;margin-top:2em;margin-bottom:0.2em;'>
@@ -77,26 +183,44 @@ st.markdown("""
 """, unsafe_allow_html=True)
 aws_access_key_id = st.text_input("AWS Access Key ID", type="password", placeholder="Enter your AWS Access Key ID")
 aws_secret_access_key = st.text_input("AWS Secret Access Key", type="password", placeholder="Enter your AWS Secret Access Key")
-regions = ["ap-south-1", "us-east-1", "eu-central-1"]
+DEFAULT_REGIONS = ["ap-south-1", "us-east-1", "eu-central-1"]
+regions = DEFAULT_REGIONS
+if aws_access_key_id and aws_secret_access_key:
+    try:
+        enabled_regions = get_enabled_regions(aws_access_key_id, aws_secret_access_key)
+        regions = [r for r in DEFAULT_REGIONS if r in enabled_regions] + [r for r in enabled_regions if r not in DEFAULT_REGIONS]
+    except Exception:
+        regions = DEFAULT_REGIONS
 region = st.selectbox("🌍 Choose AWS Region", regions)
 
 if not aws_access_key_id or not aws_secret_access_key:
     st.warning("Please enter your AWS credentials to proceed.")
+    finish_render()
     st.stop()
 
 instance_types = ["t2.micro", "t2.small", "t2.medium", "t3.micro"]
 instance_type = st.selectbox("📦 Select Instance Type", instance_types)
 
-def fetch_aws_resources(aws_access_key_id, aws_secret_access_key, region):
-    key_pairs = get_key_pairs(aws_access_key_id, aws_secret_access_key, region)
-    security_groups = get_security_groups(aws_access_key_id, aws_secret_access_key, region)
-    subnets = get_subnets(aws_access_key_id, aws_secret_access_key, region)
-    iam_roles = get_iam_roles(aws_access_key_id, aws_secret_access_key, region)
-    return key_pairs, security_groups, subnets, iam_roles
+def fetch_aws_resources(resource_futures):
+    results, sources, errors = collect_resources(resource_futures)
+    for name, error in errors.items():
+        st.warning(f"Could not load {name.lower()}: {error}")
+    return results["Key pairs"], results["Security groups"], results["Subnets"], results["IAM roles"], sources
 
-key_pairs, security_groups, subnets, iam_roles = fetch_aws_resources(
-    aws_access_key_id, aws_secret_access_key, region
-)
+force_refresh = st.button("🔄 Refresh AWS resources")
+if force_refresh:
+    invalidate_cache(aws_access_key_id=aws_access_key_id, aws_secret_access_key=aws_secret_access_key)
+
+resource_futures = start_resource_fetch(aws_access_key_id, aws_secret_access_key, region, force_refresh)
+
+AMI_TYPE_FAMILIES = {AMI_FAMILIES[family]["label"]: family for family in ("rhel", "amazon_linux", "windows", "macos")}
+AMI_FETCH_TIMEOUT = 20
+
+# Every family is preloaded so switching AMI type is served from the catalog cache
+ami_futures = submit_parallel({
+    family: partial(snapshot_lookup, aws_access_key_id, aws_secret_access_key, region, f"amis:{family}", force=force_refresh)
+    for family in AMI_TYPE_FAMILIES.values()
+}, priority=PRIORITY_BACKGROUND)
 
 st.markdown("""
 <div style='display:flex;align-items:center;font-family:Montserrat,sans-serif;font-size:1.25rem;font-weight:700;color:#16a085;margin-top:1.5em;margin-bottom:0.2em;'>
@@ -106,44 +230,28 @@ st.markdown("""
 st.markdown("<span style='font-size:0.98rem;color:#b2bec3;'>Select the type of AMI you want to use</span>", unsafe_allow_html=True)
 ami_type = st.selectbox(
     "Select AMI Type",
-    ["RHEL", "Amazon Linux 2", "Windows", "macOS", "Manual Entry (Other)"]
+    list(AMI_TYPE_FAMILIES) + ["Manual Entry (Other)"]
 )
 ami_id = ""
-if ami_type == "RHEL":
-    rhel_amis = get_recent_rhel_amis(aws_access_key_id, aws_secret_access_key, region)
-    if rhel_amis:
-        ami_options = [f"{ami['Name']} ({ami['ImageId']})" for ami in rhel_amis]
-        ami_choice = st.selectbox("Choose RHEL AMI", ami_options)
-        ami_id = rhel_amis[ami_options.index(ami_choice)]["ImageId"]
-    else:
-        st.error("No RHEL AMIs found in this region.")
-elif ami_type == "Amazon Linux 2":
-    amazon_amis = get_recent_amazon_linux_amis(aws_access_key_id, aws_secret_access_key, region)
-    if amazon_amis:
-        ami_options = [f"{ami['Name']} ({ami['ImageId']})" for ami in amazon_amis]
-        ami_choice = st.selectbox("Choose Amazon Linux 2 AMI", ami_options)
-        ami_id = amazon_amis[ami_options.index(ami_choice)]["ImageId"]
-    else:
-        st.error("No Amazon Linux 2 AMIs found in this region.")
-elif ami_type == "Windows":
-    windows_amis = get_recent_windows_amis(aws_access_key_id, aws_secret_access_key, region)
-    if windows_amis:
-        ami_options = [f"{ami['Name']} ({ami['ImageId']})" for ami in windows_amis]
-        ami_choice = st.selectbox("Choose Windows AMI", ami_options)
-        ami_id = windows_amis[ami_options.index(ami_choice)]["ImageId"]
-    else:
-        st.error("No Windows AMIs found in this region.")
-elif ami_type == "macOS":
-    macos_amis = get_recent_macos_amis(aws_access_key_id, aws_secret_access_key, region)
-    if macos_amis:
-        ami_options = [f"{ami['Name']} ({ami['ImageId']})" for ami in macos_amis]
-        ami_choice = st.selectbox("Choose macOS AMI", ami_options)
-        ami_id = macos_amis[ami_options.index(ami_choice)]["ImageId"]
+if ami_type in AMI_TYPE_FAMILIES:
+    family = AMI_TYPE_FAMILIES[ami_type]
+    _, ami_result, ami_error = next(iter_parallel({family: ami_futures[family]}, AMI_FETCH_TIMEOUT))
+    family_amis = ami_result[0] if ami_result else None
+    if ami_error is not None:
+        st.error(f"Failed to load {ami_type} AMIs: {ami_error}")
+    elif family_amis:
+        ami_labels = {ami["ImageId"]: f"{ami['Name']} ({ami['ImageId']})" for ami in family_amis}
+        ami_id = st.selectbox(f"Choose {ami_type} AMI", list(ami_labels), format_func=ami_labels.get)
     else:
-        st.error("No macOS AMIs found in this region.")
+        st.error(f"No {ami_type} AMIs found in this region.")
 else:
     ami_id = st.text_input("Enter AMI ID", placeholder="e.g. ami-0abcdef1234567890")
 
+key_pairs, security_groups, subnets, iam_roles, resource_sources = fetch_aws_resources(resource_futures)
+st.caption(" · ".join(f"{name}: {source}" for name, source in resource_sources.items()))
+for resource, error in refresh_errors(aws_access_key_id, aws_secret_access_key, region).items():
+    st.warning(f"Background refresh of {resource} failed, showing the last saved copy: {error}")
+
 st.markdown("""
 <div style='display:flex;align-items:center;font-family:Montserrat,sans-serif;font-size:1.25rem;font-weight:700;color:#8e44ad;margin-top:1.5em;margin-bottom:0.2em;'>
   <span style='font-size:1.3em;margin-right:0.5em;'>🔑</span>Key Pair Name
@@ -159,6 +267,7 @@ if key_name == "Create new key pair...":
         if new_key_name:
             try:
                 new_key_material = create_key_pair(aws_access_key_id, aws_secret_access_key, region, new_key_name)
+                invalidate_snapshot(aws_access_key_id, aws_secret_access_key, region, "key_pairs")
                 st.success(f"Key pair '{new_key_name}' created successfully!")
                 st.download_button(
                     label="Download PEM file",
@@ -178,10 +287,8 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 st.markdown("<span style='font-size:0.98rem;color:#b2bec3;'>Select one or more security groups for your instance</span>", unsafe_allow_html=True)
-selected_sgs = st.multiselect(
-    "", [f"{sg['GroupName']} ({sg['GroupId']})" for sg in security_groups]
-)
-security_group_ids = [sg['GroupId'] for sg in security_groups if f"{sg['GroupName']} ({sg['GroupId']})" in selected_sgs]
+selected_sgs = st.multiselect("", security_groups.labels)
+security_group_ids = security_groups.ids_for_labels(selected_sgs)
 
 st.markdown("""
 <div style='display:flex;align-items:center;font-family:Montserrat,sans-serif;font-size:1.25rem;font-weight:700;color:#27ae60;margin-top:1.5em;margin-bottom:0.2em;'>
@@ -189,11 +296,10 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 st.markdown("<span style='font-size:0.98rem;color:#b2bec3;'>Select a subnet for your instance</span>", unsafe_allow_html=True)
-subnet_display = [f"{sn['SubnetId']} ({sn['CidrBlock']})" for sn in subnets]
-subnet_choice = st.selectbox("", ["(Use default subnet)"] + subnet_display) if subnet_display else None
+subnet_choice = st.selectbox("", ["(Use default subnet)"] + subnets.labels) if len(subnets) else None
 subnet_id = None
-if subnet_choice and subnet_choice != "(Use default subnet)":
-    subnet_id = subnet_choice.split()[0]
+if subnet_choice in subnets.by_label:
+    subnet_id = subnets.by_label[subnet_choice].id
 
 st.markdown("""
 <div style='display:flex;align-items:center;font-family:Montserrat,sans-serif;font-size:1.25rem;font-weight:700;color:#c0392b;margin-top:1.5em;margin-bottom:0.2em;'>
@@ -231,7 +337,36 @@ st.markdown("""
 st.markdown("<br>", unsafe_allow_html=True)
 user_data = st.text_area("User Data (optional)", placeholder="#!/bin/bash\necho Hello World > /home/ec2-user/hello.txt")
 volume_size = st.number_input("Root Volume Size (GB)", min_value=8, max_value=2000, value=8)
-volume_type = st.selectbox("Root Volume Type", ["gp2", "gp3", "io1", "io2", "sc1", "st1"])
+# io1/io2 need provisioned IOPS, which the launcher does not set, and sc1/st1 cannot be root volumes
+volume_type = st.selectbox("Root Volume Type", [t for t in ROOT_VOLUME_TYPES if t not in PROVISIONED_IOPS_VOLUME_TYPES])
+instance_count = st.number_input("Number of Instances", min_value=1, max_value=100, value=1)
+use_warm_pool = st.checkbox("⚡ Launch from warm pool", help="Start a pre-built stopped instance when one matches; otherwise launch normally.")
+if use_warm_pool and user_data:
+    st.caption("ℹ️ Launches with user data skip the warm pool.")
+    use_warm_pool = False
+pool_stats = get_warm_pool_stats(aws_access_key_id, aws_secret_access_key, region)
+if pool_stats["Instances"] or any(profile["Target"] for profile in pool_stats["Profiles"].values()):
+    if st.button("🧊 Turn off warm pool", help="Terminate every warm-pool instance in this region and stop the background replenisher."):
+        terminated = drain_warm_pool(aws_access_key_id, aws_secret_access_key, region)
+        st.info(f"Warm pool turned off; terminating {terminated} pool instances.")
+if use_warm_pool:
+    warm_pool_size = st.number_input("Warm pool size for this AMI / type / subnet", min_value=0, max_value=50, value=2)
+    if ami_id and key_name != "Create new key pair...":
+        profile = pool_stats["Profiles"].get(warm_profile_id(
+            instance_type, ami_id, key_name, subnet_id or None, int(volume_size), volume_type
+        ))
+        if profile:
+            st.caption(f"Warm pool: {profile['Ready']} ready, {profile['Warming']} warming (target {profile['Target']})")
+        if pool_stats["Hit Rate"] is not None:
+            warm, cold = pool_stats["Warm Launch Seconds"], pool_stats["Cold Launch Seconds"]
+            st.caption(
+                f"Hit rate {pool_stats['Hit Rate']:.0%} · "
+                f"warm p50 {warm['p50'] if warm else '–'}s · cold p50 {cold['p50'] if cold else '–'}s"
+            )
+
+if "launch_jobs" not in st.session_state:
+    st.session_state["launch_jobs"] = []
+    st.session_state["announced_jobs"] = set()
 
 if st.button("🚀 Launch Instance"):
     if not ami_id:
@@ -239,39 +374,79 @@ if st.button("🚀 Launch Instance"):
     elif key_name == "Create new key pair...":
         st.error("❌ Please create and download your new key pair before launching.")
     else:
-        status_placeholder = st.empty()
-        with st.spinner("Launching EC2 Instance..."):
-            for msg in ["Contacting AWS...", "Preparing launch parameters...", "Launching instance..."]:
-                status_placeholder.info(msg)
-                time.sleep(0.7)
-            info = launch_instance(
+        launch_spec = dict(
+            instance_type=instance_type,
+            ami_id=ami_id,
+            key_name=key_name,
+            security_group_ids=security_group_ids if security_group_ids else None,
+            subnet_id=subnet_id if subnet_id else None,
+            iam_instance_profile=iam_role,
+            user_data=user_data if user_data else None,
+            volume_size=int(volume_size),
+            volume_type=volume_type,
+            tags=tags if tags else None
+        )
+        # Memoized per parameter combination, so a known-good profile costs nothing here
+        with st.spinner("Checking launch settings..."):
+            verdict = preflight_launch(aws_access_key_id, aws_secret_access_key, region, **launch_spec)
+        for warning in verdict["Warnings"]:
+            st.warning(f"⚠️ {warning}")
+        if not verdict["OK"]:
+            for error in verdict["Errors"]:
+                st.error(f"❌ {error}")
+        else:
+            if use_warm_pool:
+                configure_warm_pool(
+                    aws_access_key_id, aws_secret_access_key, region, int(warm_pool_size), instance_type, ami_id,
+                    key_name, launch_spec["subnet_id"], int(volume_size), volume_type
+                )
+            job_id = submit_launch_job(
                 aws_access_key_id=aws_access_key_id,
                 aws_secret_access_key=aws_secret_access_key,
                 region=region,
-                instance_type=instance_type,
-                ami_id=ami_id,
-                key_name=key_name,
-                security_group_ids=security_group_ids if security_group_ids else None,
-                subnet_id=subnet_id if subnet_id else None,
-                iam_instance_profile=iam_role,
-                user_data=user_data if user_data else None,
-                volume_size=int(volume_size),
-                volume_type=volume_type,
-                tags=tags if tags else None
+                count=int(instance_count),
+                warm_pool=use_warm_pool,
+                **launch_spec
             )
-            status_placeholder.empty()
-            if "Error" in info:
-                st.error(f"❌ {info['Error']}")
-            else:
-                st.success("✅ Instance Launched Successfully!")
-                st.balloons()
-                st.session_state['last_instance'] = info
+            st.session_state["launch_jobs"].append(job_id)
+            st.info(f"🛰️ Launch job {job_id} submitted.")
+
+LAUNCH_JOB_POLL_SECONDS = 3
+
+def render_launch_jobs():
+    for job_id in reversed(st.session_state["launch_jobs"]):
+        job = get_launch_job(job_id)
+        if job is None:
+            continue
+        running = sum(1 for instance in job["Instances"] if instance["State"] == "running")
+        warm = f" · {job['Warm']} from warm pool" if job["Warm"] else ""
+        st.write(f"**Job {job_id}** · {job['Status']} · {running}/{job['Requested']} running{warm}")
+        for failure in job["Failures"]:
+            st.warning(failure["Error"])
+        if job["Requested"] > 1 and job["Instances"]:
+            st.dataframe(job["Instances"])
+        if job["Status"] in JOB_DONE_STATUSES and job_id not in st.session_state["announced_jobs"]:
+            st.session_state["announced_jobs"].add(job_id)
+            if running:
+                st.session_state["last_instance"] = next(i for i in job["Instances"] if i["State"] == "running")
+                st.session_state["celebrate"] = True
+            # Finished jobs change the instance card below, which lives outside this fragment
+            st.rerun()
+
+active_jobs = any(
+    (get_launch_job(job_id) or {}).get("Status") not in JOB_DONE_STATUSES + (None,)
+    for job_id in st.session_state["launch_jobs"]
+)
+if st.session_state["launch_jobs"]:
+    st.fragment(run_every=LAUNCH_JOB_POLL_SECONDS if active_jobs else None)(render_launch_jobs)()
+
+if st.session_state.pop("celebrate", False):
+    st.success("✅ Instance Launched Successfully!")
+    st.balloons()
 
 last_instance = st.session_state.get('last_instance')
 if last_instance and 'Instance ID' in last_instance:
-    lottie_success = load_lottieurl("https://assets2.lottiefiles.com/packages/lf20_kkflmtur.json")
-    if st_lottie and lottie_success:
-        st_lottie(lottie_success, height=100, key="success-checkmark")
+    render_lottie(st.empty(), lottie_asset(success_lottie_url, wait=LOTTIE_WAIT), height=100, key="success-checkmark")
     st.markdown(
         f'''
         <div style="background: linear-gradient(90deg, #e0eafc 0%, #cfdef3 100%); border-radius: 16px; padding: 1.5em; margin-top: 1em; box-shadow: 0 4px 16px rgba(44,62,80,0.08);">
@@ -306,3 +481,75 @@ if last_instance and 'Instance ID' in last_instance:
                 st.success("Instance termination initiated.")
             except Exception as e:
                 st.error(f"Failed to terminate instance: {e}")
+
+def run_bulk_action(action, ids, tags, wait):
+    with st.spinner(f"Running {action} on selected instances..."):
+        outcome = bulk_instance_action(
+            aws_access_key_id, aws_secret_access_key, region, action,
+            instance_ids=ids, tags=tags, wait=wait
+        )
+    summary = outcome["Summary"]
+    st.info(f"{summary['Succeeded']}/{summary['Requested']} succeeded, {summary['Failed']} failed")
+    if outcome["Results"]:
+        st.dataframe(outcome["Results"])
+
+with st.expander("🧹 Bulk Instance Actions"):
+    bulk_ids = st.text_area("Instance IDs (one per line)", placeholder="i-0123456789abcdef0", key="bulk_ids")
+    bulk_tag_key = st.text_input("Or select by Tag Key", key="bulk_tag_key", placeholder="e.g. Environment")
+    bulk_tag_value = st.text_input("Tag Value", key="bulk_tag_value", placeholder="e.g. LoadTest")
+    bulk_action = st.selectbox("Action", ["stop", "start", "terminate"], key="bulk_action")
+    bulk_wait = st.checkbox("Wait for all instances to reach the target state", key="bulk_wait")
+    if st.button("Run Bulk Action", key="bulk_action_btn"):
+        ids = [line.strip() for line in bulk_ids.splitlines() if line.strip()]
+        bulk_tags = {bulk_tag_key: bulk_tag_value} if bulk_tag_key and bulk_tag_value else None
+        if not ids and not bulk_tags:
+            st.warning("Enter instance IDs or a tag to select instances.")
+        elif bulk_action == "terminate" and bulk_tags:
+            # A tag can match far more than expected, so the resolved IDs are confirmed before terminating
+            with st.spinner("Finding instances with that tag..."):
+                matched = find_instances_by_tags(aws_access_key_id, aws_secret_access_key, region, bulk_tags)
+            if ids or matched:
+                st.session_state["bulk_confirm"] = {
+                    "ids": list(dict.fromkeys(ids + matched)), "region": region, "wait": bulk_wait,
+                    "selection": f"tag {bulk_tag_key}={bulk_tag_value}" + (" plus the listed IDs" if ids else ""),
+                }
+            else:
+                st.info("No running or stopped instances have that tag.")
+        else:
+            run_bulk_action(bulk_action, ids, bulk_tags, bulk_wait)
+    pending_terminate = st.session_state.get("bulk_confirm")
+    if pending_terminate and pending_terminate["region"] != region:
+        st.session_state.pop("bulk_confirm")
+    elif pending_terminate:
+        st.warning(
+            f"⚠️ Terminate {len(pending_terminate['ids'])} instances in {region} "
+            f"({pending_terminate['selection']})? This cannot be undone."
+        )
+        confirm_col, cancel_col = st.columns(2)
+        confirmed = confirm_col.button("Confirm terminate", key="bulk_confirm_btn")
+        cancelled = cancel_col.button("Cancel", key="bulk_cancel_btn")
+        if confirmed or cancelled:
+            st.session_state.pop("bulk_confirm")
+        if confirmed:
+            run_bulk_action("terminate", pending_terminate["ids"], None, pending_terminate["wait"])
+
+with st.expander("🌐 Multi-Region Overview"):
+    if st.button("Scan all enabled regions", key="scan_regions_btn"):
+        with st.spinner("Scanning regions..."):
+            st.session_state["region_scan"] = scan_regions(aws_access_key_id, aws_secret_access_key)
+    region_scan = st.session_state.get("region_scan")
+    if region_scan:
+        st.dataframe([
+            {
+                "Region": scanned_region,
+                "Key pairs": len(entry["key_pairs"]),
+                "Security groups": len(entry["security_groups"]),
+                "Subnets": len(entry["subnets"]),
+                **{AMI_FAMILIES[family]["label"]: (ami or {}).get("ImageId", "") for family, ami in entry["amis"].items()},
+                "Errors": len(entry["errors"]),
+                "Seconds": entry.get("seconds", 0),
+            }
+            for scanned_region, entry in region_scan.items()
+        ])
+
+finish_render()
@@ -0,0 +1,354 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ec2_launcher import (
+    AMI_FAMILIES, FAILED_LAUNCH_STATES, TRACKER_WAIT_TIMEOUT,
+    launch_instances, get_instance_tracker, terminate_instances
+)
+from inventory_snapshot import snapshot_lookup
+
+DEFAULT_CONCURRENCY = 8
+SPEC_FIELDS = (
+    'region', 'count', 'name', 'ami_id', 'ami_family', 'instance_type', 'key_name', 'security_groups',
+    'subnet', 'iam_instance_profile', 'user_data', 'user_data_file', 'volume_size', 'volume_type', 'tags'
+)
+
+def _load_structured(text, path):
+    if path and path.endswith(('.yaml', '.yml')):
+        try:
+            import yaml
+        except ImportError:
+            raise SystemExit('YAML manifests need PyYAML: pip install pyyaml')
+        return yaml.safe_load(text)
+    return json.loads(text)
+
+def iter_specs(path):
+    # A manifest is {"defaults": {...}, "instances": [...]} or a bare list; a .jsonl
+    # file or stdin is read one spec per line so launches start before input ends.
+    if path in (None, '-') or path.endswith('.jsonl'):
+        stream = sys.stdin if path in (None, '-') else open(path)
+        try:
+            for line in stream:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    yield json.loads(line)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        return
+    with open(path) as f:
+        manifest = _load_structured(f.read(), path)
+    if isinstance(manifest, list):
+        manifest = {'instances': manifest}
+    defaults = manifest.get('defaults') or {}
+    for spec in manifest.get('instances') or []:
+        yield dict(defaults, **spec)
+
+def _find_record(index, name):
+    # Accepts an ID, the label shown in the app, or an exact name
+    record = index.get(name) or index.by_label.get(name)
+    if record is None:
+        record = next((r for r in index.with_prefix(name) if r.name == name), None)
+    return record
+
+class InventoryResolver:
+    # Names and family aliases are resolved against the on-disk inventory snapshot;
+    # a miss forces one refresh from AWS before the spec is rejected.
+
+    def __init__(self, aws_access_key_id, aws_secret_access_key):
+        self._credentials = (aws_access_key_id, aws_secret_access_key)
+        self._lock = threading.Lock()
+        self._forced = set()
+
+    def _lookup(self, region, resource, force=False):
+        value, _ = snapshot_lookup(*self._credentials, region, resource, force=force)
+        return value
+
+    def _resolve(self, region, resource, match):
+        found = match(self._lookup(region, resource))
+        if found is None:
+            with self._lock:
+                refresh = (region, resource) not in self._forced
+                self._forced.add((region, resource))
+            if refresh:
+                found = match(self._lookup(region, resource, force=True))
+        return found
+
+    def ami(self, region, spec):
+        if spec.get('ami_id'):
+            return spec['ami_id']
+        family = spec.get('ami_family')
+        if family not in AMI_FAMILIES:
+            raise ValueError(f"Spec needs ami_id or one of ami_family: {', '.join(AMI_FAMILIES)}")
+        amis = self._resolve(region, f'amis:{family}', lambda amis: amis or None)
+        if not amis:
+            raise ValueError(f"No {AMI_FAMILIES[family]['label']} AMIs found in {region}")
+        return amis[0]['ImageId']
+
+    def security_groups(self, region, names):
+        if isinstance(names, str):
+            names = [names]
+        group_ids = []
+        for name in names or []:
+            record = self._resolve(region, 'security_groups', lambda index, name=name: _find_record(index, name))
+            if record is None:
+                raise ValueError(f"Unknown security group: {name}")
+            group_ids.append(record.id)
+        return group_ids
+
+    def subnet(self, region, name):
+        if not name:
+            return None
+        record = self._resolve(region, 'subnets', lambda index: _find_record(index, name))
+        if record is None:
+            raise ValueError(f"Unknown subnet: {name}")
+        return record.id
+
+    def key_pair(self, region, key_name):
+        if not key_name:
+            raise ValueError("Spec needs key_name")
+        if not self._resolve(region, 'key_pairs', lambda key_pairs: True if key_name in key_pairs else None):
+            raise ValueError(f"Unknown key pair: {key_name}")
+        return key_name
+
+def _normalize_tags(spec):
+    tags = spec.get('tags') or []
+    if isinstance(tags, dict):
+        tags = [{'Key': key, 'Value': str(value)} for key, value in tags.items()]
+    if spec.get('name'):
+        tags = [tag for tag in tags if tag['Key'] != 'Name']
+        tags.insert(0, {'Key': 'Name', 'Value': spec['name']})
+    return tags or None
+
+def resolve_spec(resolver, spec, default_region):
+    unknown = set(spec) - set(SPEC_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown spec fields: {', '.join(sorted(unknown))}")
+    region = spec.get('region') or default_region
+    if not region:
+        raise ValueError("Spec needs a region (or pass --region)")
+    if not spec.get('instance_type'):
+        raise ValueError("Spec needs instance_type")
+    user_data = spec.get('user_data')
+    if spec.get('user_data_file'):
+        with open(spec['user_data_file']) as f:
+            user_data = f.read()
+    resolved = {
+        'count': int(spec.get('count', 1)),
+        'instance_type': spec['instance_type'],
+        'ami_id': resolver.ami(region, spec),
+        'key_name': resolver.key_pair(region, spec.get('key_name')),
+        'security_group_ids': resolver.security_groups(region, spec.get('security_groups')) or None,
+        'subnet_id': resolver.subnet(region, spec.get('subnet')),
+        'iam_instance_profile': spec.get('iam_instance_profile'),
+        'user_data': user_data,
+        'volume_size': int(spec.get('volume_size', 8)),
+        'volume_type': spec.get('volume_type', 'gp2'),
+        'tags': _normalize_tags(spec),
+    }
+    return region, resolved
+
+class ResultWriter:
+    def __init__(self, stream):
+        self._stream = stream
+        self._lock = threading.Lock()
+        self._emitted = set()
+        self.failed = 0
+        self.succeeded = 0
+
+    def emit(self, record):
+        instance_id = record.get('Instance ID')
+        with self._lock:
+            if instance_id:
+                if instance_id in self._emitted:
+                    return
+                self._emitted.add(instance_id)
+            if record.get('Error'):
+                self.failed += record.get('Requested', 1)
+            else:
+                self.succeeded += 1
+            self._stream.write(json.dumps(record, default=str) + '\n')
+            self._stream.flush()
+
+class PendingLaunches:
+    # Launched instances waiting for a final state. Workers hand their instances over and
+    # return; result lines are written from tracker events, the way launch jobs settle.
+
+    def __init__(self, writer, timeout):
+        self._writer = writer
+        self._timeout = timeout
+        self._condition = threading.Condition()
+        self._pending = {}
+        self._unsubscribe = {}
+
+    def add(self, tracker, index, region, launched):
+        deadline = time.monotonic() + self._timeout
+        with self._condition:
+            if id(tracker) not in self._unsubscribe:
+                self._unsubscribe[id(tracker)] = tracker.subscribe(self._on_event)
+            for instance_id, details in launched.items():
+                self._pending[instance_id] = (details, index, region, deadline, tracker)
+        tracker.watch(list(launched))
+
+    def _on_event(self, event):
+        if event['State'] not in ('running',) + FAILED_LAUNCH_STATES:
+            return
+        with self._condition:
+            entry = self._pending.pop(event['Instance ID'], None)
+            self._condition.notify_all()
+        if entry is None:
+            return
+        _, index, region, _, tracker = entry
+        tracker.unwatch([event['Instance ID']])
+        details = {key: value for key, value in event.items() if key not in ('Change', 'Previous State')}
+        error = None if details['State'] == 'running' else f"Instance entered state {details['State']} instead of running"
+        self._writer.emit(dict(details, Spec=index, Region=region, Error=error))
+
+    def _expire(self):
+        now = time.monotonic()
+        with self._condition:
+            expired = {i: entry for i, entry in self._pending.items() if entry[3] <= now}
+            for instance_id in expired:
+                del self._pending[instance_id]
+        for instance_id, (details, index, region, _, tracker) in expired.items():
+            tracker.unwatch([instance_id])
+            self._writer.emit(dict(details, Spec=index, Region=region,
+                                   Error='Timed out waiting for instance to start running'))
+
+    def wait(self):
+        # Called once every spec has been submitted; returns when nothing is pending
+        while True:
+            self._expire()
+            with self._condition:
+                if not self._pending:
+                    break
+                next_deadline = min(entry[3] for entry in self._pending.values())
+                self._condition.wait(max(0, next_deadline - time.monotonic()))
+        with self._condition:
+            unsubscribes, self._unsubscribe = list(self._unsubscribe.values()), {}
+        for unsubscribe in unsubscribes:
+            unsubscribe()
+
+def launch_spec(aws_access_key_id, aws_secret_access_key, resolver, writer, index, spec, default_region, pending=None):
+    try:
+        region, resolved = resolve_spec(resolver, spec, default_region)
+    except Exception as e:
+        writer.emit({'Spec': index, 'Requested': int(spec.get('count', 1)), 'Error': str(e)})
+        return
+    result = launch_instances(aws_access_key_id, aws_secret_access_key, region, specs=[resolved], wait=False)
+    for failure in result['Failures']:
+        writer.emit({'Spec': index, 'Region': region, 'Requested': result['Summary']['Failed'], 'Error': failure['Error']})
+    launched = {details['Instance ID']: details for details in result['Instances']}
+    if not launched:
+        return
+    if pending is None:
+        for details in launched.values():
+            writer.emit(dict(details, Spec=index, Region=region, Error=None))
+        return
+    pending.add(get_instance_tracker(aws_access_key_id, aws_secret_access_key, region), index, region, launched)
+
+def run_launch(args, aws_access_key_id, aws_secret_access_key, output):
+    resolver = InventoryResolver(aws_access_key_id, aws_secret_access_key)
+    writer = ResultWriter(output)
+    pending = None if args.no_wait else PendingLaunches(writer, args.timeout)
+    # Bounded queue: a long stream never holds more than a few specs in memory
+    slots = threading.BoundedSemaphore(args.concurrency * 2)
+
+    def run(index, spec):
+        try:
+            launch_spec(aws_access_key_id, aws_secret_access_key, resolver, writer, index, spec, args.region, pending)
+        except Exception as e:
+            writer.emit({'Spec': index, 'Requested': int(spec.get('count', 1)), 'Error': str(e)})
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix='ec2-batch') as executor:
+        for index, spec in enumerate(iter_specs(args.manifest)):
+            slots.acquire()
+            executor.submit(run, index, spec)
+    if pending:
+        pending.wait()
+    return writer
+
+def _instance_ids_from(path):
+    stream = sys.stdin if path == '-' else open(path)
+    try:
+        by_region = {}
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                record = json.loads(line)
+                if record.get('Instance ID'):
+                    by_region.setdefault(record.get('Region'), []).append(record['Instance ID'])
+            else:
+                by_region.setdefault(None, []).append(line)
+        return by_region
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+def run_terminate(args, aws_access_key_id, aws_secret_access_key, output):
+    writer = ResultWriter(output)
+    tags = dict(tag.split('=', 1) for tag in args.tag) if args.tag else None
+    if args.results:
+        targets = _instance_ids_from(args.results)
+    else:
+        targets = {None: list(args.instance_ids)}
+    if tags and not any(targets.values()):
+        targets = {None: None}
+    for region, instance_ids in targets.items():
+        region = region or args.region
+        if not region:
+            raise SystemExit('Pass --region or terminate from a results file that records regions')
+        outcome = terminate_instances(aws_access_key_id, aws_secret_access_key, region, instance_ids, tags, wait=not args.no_wait)
+        for result in outcome['Results']:
+            writer.emit(result)
+    return writer
+
+def main(argv=None):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--region', default=os.environ.get('AWS_DEFAULT_REGION'), help='Default region for specs that omit one')
+    common.add_argument('--output', help='Append result lines here instead of stdout')
+    common.add_argument('--no-wait', action='store_true', help='Report instances without waiting for their final state')
+    parser = argparse.ArgumentParser(description='Launch or terminate EC2 instances from a spec file, without the UI.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    launch = subparsers.add_parser('launch', parents=[common], help='Launch instances from a JSON/YAML manifest or a JSONL stream')
+    launch.add_argument('manifest', nargs='?', default='-', help="Manifest path, a .jsonl file, or '-' for stdin")
+    launch.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    launch.add_argument('--timeout', type=float, default=TRACKER_WAIT_TIMEOUT, help='Seconds to wait for each spec to reach running')
+
+    terminate = subparsers.add_parser('terminate', parents=[common], help='Terminate instances by ID, tag, or from a launch results file')
+    terminate.add_argument('instance_ids', nargs='*')
+    terminate.add_argument('--results', help="Launch results (JSONL) or a file of instance IDs; '-' for stdin")
+    terminate.add_argument('--tag', action='append', help='KEY=VALUE; may be repeated')
+
+    args = parser.parse_args(argv)
+    aws_access_key_id = os.environ.get('AWS_ACCESS_KEY_ID')
+    aws_secret_access_key = os.environ.get('AWS_SECRET_ACCESS_KEY')
+    if not aws_access_key_id or not aws_secret_access_key:
+        parser.error('Set AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY')
+    if args.command == 'terminate' and not (args.instance_ids or args.results or args.tag):
+        parser.error('terminate needs instance IDs, --results or --tag')
+
+    output = open(args.output, 'a') if args.output else sys.stdout
+    try:
+        if args.command == 'launch':
+            writer = run_launch(args, aws_access_key_id, aws_secret_access_key, output)
+        else:
+            writer = run_terminate(args, aws_access_key_id, aws_secret_access_key, output)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(f'{writer.succeeded} succeeded, {writer.failed} failed', file=sys.stderr)
+    return 1 if writer.failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,459 @@
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from urllib.parse import parse_qs
+from xml.sax.saxutils import escape
+
+from botocore.awsrequest import AWSResponse
+
+import ec2_launcher
+import inventory_snapshot
+import metrics
+import resource_fetch
+
+# Synthetic account sizes; "large" is the shape that hurts in real accounts
+ACCOUNT_SIZES = {
+    'small': {'security_groups': 10, 'subnets': 10, 'key_pairs': 5, 'images': 50, 'roles': 20},
+    'large': {'security_groups': 10000, 'subnets': 2000, 'key_pairs': 500, 'images': 5000, 'roles': 3000},
+}
+BENCH_REGION = 'us-east-1'
+DEFAULT_PAGE_LIMIT = 1000
+WARM_POOL_FILL_TIMEOUT = 60
+IAM_PAGE_LIMIT = 100
+
+class FakeAWSError(Exception):
+    def __init__(self, code, message, status=400):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.status = status
+
+class _Headers(dict):
+    # botocore reads response headers case-insensitively
+    def get(self, key, default=None):
+        return super().get(key.lower(), default)
+
+class FakeAWSBackend:
+    # Answers EC2 and IAM query-protocol requests from an in-memory account at the
+    # before-send hook, so parsing, retries, rate limiting and metrics all still run.
+
+    def __init__(self, size, latency=0.0, jitter=0.0, throttle_rate=0.0, pending_seconds=0.3, seed=7):
+        counts = ACCOUNT_SIZES[size]
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.pending_seconds = pending_seconds
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._instances = {}
+        self._next_instance = 0
+        self.security_groups = [
+            {'GroupId': f'sg-{i:08x}', 'GroupName': f'group-{i}', 'VpcId': f'vpc-{i % 20:04x}',
+             'Description': 'bench', 'OwnerId': '123456789012'}
+            for i in range(counts['security_groups'])
+        ]
+        self.subnets = [
+            {'SubnetId': f'subnet-{i:08x}', 'CidrBlock': f'10.{i // 256 % 256}.{i % 256}.0/24',
+             'VpcId': f'vpc-{i % 20:04x}', 'AvailabilityZone': f'{BENCH_REGION}{"abc"[i % 3]}',
+             'Tags': [{'Key': 'Name', 'Value': f'subnet-{i}'}]}
+            for i in range(counts['subnets'])
+        ]
+        self.key_pairs = [{'KeyName': f'key-{i}', 'KeyPairId': f'key-{i:08x}'} for i in range(counts['key_pairs'])]
+        self.images = [
+            {'ImageId': f'ami-{i:08x}', 'Name': f'image-{i}', 'Architecture': 'x86_64', 'State': 'available',
+             'CreationDate': f'20{10 + i % 15:02d}-{1 + i % 12:02d}-{1 + i % 28:02d}T00:00:00.000Z',
+             'RootDeviceName': '/dev/xvda', 'RootDeviceType': 'ebs', 'VirtualizationType': 'hvm',
+             'BlockDeviceMappings': [{'DeviceName': '/dev/xvda', 'Ebs': {'VolumeSize': 8}}]}
+            for i in range(counts['images'])
+        ]
+        self.roles = [
+            {'RoleName': f'role-{i}', 'RoleId': f'AROA{i:016d}', 'Arn': f'arn:aws:iam::123456789012:role/role-{i}',
+             'Path': '/', 'CreateDate': datetime(2020, 1, 1, tzinfo=timezone.utc)}
+            for i in range(counts['roles'])
+        ]
+
+    def attach(self, client):
+        service = client.meta.service_model
+        client.meta.events.register('before-send', lambda request, **kwargs: self._handle(service, request))
+
+    def _handle(self, service_model, request):
+        params = {k: v[0] for k, v in parse_qs(request.body.decode() if isinstance(request.body, bytes) else request.body).items()}
+        action = params['Action']
+        delay = self.latency + self._random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+        if self._random.random() < self.throttle_rate:
+            return _error_response(service_model, request, 503, 'RequestLimitExceeded', 'Request limit exceeded.')
+        handler = getattr(self, f'_op_{action}')
+        try:
+            result = handler(params)
+        except FakeAWSError as e:
+            return _error_response(service_model, request, e.status, e.code, e.message)
+        operation = service_model.operation_model(action)
+        body = _serialize(service_model, operation, result)
+        return AWSResponse(request.url, 200, _Headers({'content-type': 'text/xml'}), _RawBody(body.encode()))
+
+    def _page(self, items, params, limit_key='MaxResults', token_key='NextToken', default_limit=DEFAULT_PAGE_LIMIT):
+        start = int(params.get(token_key) or 0)
+        limit = int(params.get(limit_key) or default_limit)
+        page = items[start:start + limit]
+        token = str(start + limit) if start + limit < len(items) else None
+        return page, token
+
+    def _op_DescribeSecurityGroups(self, params):
+        page, token = self._page(self.security_groups, params)
+        return {'SecurityGroups': page, 'NextToken': token}
+
+    def _op_DescribeSubnets(self, params):
+        page, token = self._page(self.subnets, params)
+        return {'Subnets': page, 'NextToken': token}
+
+    def _op_DescribeKeyPairs(self, params):
+        return {'KeyPairs': self.key_pairs}
+
+    def _op_DescribeImages(self, params):
+        wanted = {v for k, v in params.items() if k.startswith('ImageId.')}
+        if wanted:
+            return {'Images': [image for image in self.images if image['ImageId'] in wanted]}
+        page, token = self._page(self.images, params)
+        return {'Images': page, 'NextToken': token}
+
+    def _op_DescribeInstanceTypes(self, params):
+        wanted = [v for k, v in params.items() if k.startswith('InstanceType.')]
+        if any(not name.startswith(('t3.', 't2.', 'm7g.')) for name in wanted):
+            raise FakeAWSError('InvalidInstanceType', 'The following supplied instance types do not exist')
+        return {'InstanceTypes': [
+            {'InstanceType': name, 'ProcessorInfo': {'SupportedArchitectures': ['arm64' if 'g.' in name else 'x86_64']}}
+            for name in wanted
+        ]}
+
+    def _op_GetInstanceProfile(self, params):
+        name = params['InstanceProfileName']
+        if not any(role['RoleName'] == name for role in self.roles):
+            raise FakeAWSError('NoSuchEntity', f'Instance Profile {name} cannot be found.', 404)
+        return {'InstanceProfile': {
+            'InstanceProfileName': name, 'InstanceProfileId': 'AIPABENCH', 'Path': '/', 'Roles': [],
+            'Arn': f'arn:aws:iam::123456789012:instance-profile/{name}',
+            'CreateDate': datetime(2020, 1, 1, tzinfo=timezone.utc),
+        }}
+
+    def _op_DescribeRegions(self, params):
+        return {'Regions': [{'RegionName': BENCH_REGION, 'Endpoint': 'ec2.bench', 'OptInStatus': 'opt-in-not-required'}]}
+
+    def _op_ListRoles(self, params):
+        page, token = self._page(self.roles, params, 'MaxItems', 'Marker', IAM_PAGE_LIMIT)
+        return {'Roles': page, 'IsTruncated': token is not None, 'Marker': token}
+
+    def _instance(self, instance_id):
+        record = self._instances[instance_id]
+        age = time.monotonic() - record['changed']
+        if record['state'] == 'pending' and age >= self.pending_seconds:
+            record.update(state='running', changed=time.monotonic())
+        elif record['state'] in ('shutting-down', 'stopping') and age >= self.pending_seconds:
+            record.update(state='terminated' if record['state'] == 'shutting-down' else 'stopped', changed=time.monotonic())
+        instance = {
+            'InstanceId': instance_id, 'ImageId': record['image_id'], 'InstanceType': record['type'],
+            'State': {'Name': record['state'], 'Code': 0}, 'LaunchTime': record['launched'],
+        }
+        if record['state'] == 'running':
+            instance['PublicIpAddress'] = record['ip']
+        if record['tags']:
+            instance['Tags'] = [{'Key': key, 'Value': value} for key, value in record['tags'].items()]
+        return instance
+
+    def _op_RunInstances(self, params):
+        if params.get('DryRun') == 'true':
+            raise FakeAWSError('DryRunOperation', 'Request would have succeeded, but DryRun flag is set.', 412)
+        count = int(params.get('MaxCount', 1))
+        tags = _tag_params(params, 'TagSpecification.1.Tag.')
+        with self._lock:
+            created = []
+            for _ in range(count):
+                self._next_instance += 1
+                instance_id = f'i-{self._next_instance:017x}'
+                self._instances[instance_id] = {
+                    'state': 'pending', 'changed': time.monotonic(), 'image_id': params['ImageId'],
+                    'type': params['InstanceType'], 'launched': datetime.now(timezone.utc),
+                    'ip': f'198.51.{self._next_instance // 256 % 256}.{self._next_instance % 256}',
+                    'tags': dict(tags),
+                }
+                created.append(self._instance(instance_id))
+        return {'ReservationId': 'r-bench', 'OwnerId': '123456789012', 'Instances': created}
+
+    def _op_DescribeInstances(self, params):
+        wanted = [v for k, v in params.items() if k.startswith('InstanceId.')]
+        filters = {}
+        for key, value in params.items():
+            if key.startswith('Filter.') and key.endswith('.Name'):
+                number = key.split('.')[1]
+                filters[value] = {v for k, v in params.items() if k.startswith(f'Filter.{number}.Value.')}
+        with self._lock:
+            ids = wanted + list(filters.pop('instance-id', ())) if wanted or 'instance-id' in filters else list(self._instances)
+            instances = []
+            for instance_id in ids:
+                if instance_id not in self._instances:
+                    continue
+                instance = self._instance(instance_id)
+                tags = self._instances[instance_id]['tags']
+                if 'instance-state-name' in filters and instance['State']['Name'] not in filters['instance-state-name']:
+                    continue
+                if any(name.startswith('tag:') and tags.get(name[4:]) not in values for name, values in filters.items()):
+                    continue
+                if 'tag-key' in filters and not filters['tag-key'] & set(tags):
+                    continue
+                instances.append(instance)
+        return {'Reservations': [{'ReservationId': 'r-bench', 'OwnerId': '123456789012', 'Instances': instances}]}
+
+    def _op_CreateTags(self, params):
+        tags = _tag_params(params, 'Tag.')
+        with self._lock:
+            for key, instance_id in params.items():
+                if key.startswith('ResourceId.') and instance_id in self._instances:
+                    self._instances[instance_id]['tags'].update(tags)
+        return {}
+
+    def _op_DeleteTags(self, params):
+        keys = [v for k, v in params.items() if k.startswith('Tag.') and k.endswith('.Key')]
+        with self._lock:
+            for key, instance_id in params.items():
+                if key.startswith('ResourceId.') and instance_id in self._instances:
+                    for tag_key in keys:
+                        self._instances[instance_id]['tags'].pop(tag_key, None)
+        return {}
+
+    def _op_ModifyInstanceAttribute(self, params):
+        return {}
+
+    def _op_AssociateIamInstanceProfile(self, params):
+        return {'IamInstanceProfileAssociation': {'AssociationId': 'iip-assoc-bench', 'InstanceId': params['InstanceId'],
+                                                  'State': 'associating'}}
+
+    def _state_change(self, params, new_state):
+        changes = []
+        with self._lock:
+            for key, instance_id in params.items():
+                if not key.startswith('InstanceId.') or instance_id not in self._instances:
+                    continue
+                previous = self._instance(instance_id)['State']
+                self._instances[instance_id].update(state=new_state, changed=time.monotonic())
+                changes.append({'InstanceId': instance_id, 'PreviousState': previous,
+                                'CurrentState': {'Name': new_state, 'Code': 0}})
+        return changes
+
+    def _op_TerminateInstances(self, params):
+        return {'TerminatingInstances': self._state_change(params, 'shutting-down')}
+
+    def _op_StopInstances(self, params):
+        return {'StoppingInstances': self._state_change(params, 'stopping')}
+
+    def _op_StartInstances(self, params):
+        return {'StartingInstances': self._state_change(params, 'pending')}
+
+def _error_response(service_model, request, status, code, message):
+    if service_model.protocol == 'ec2':
+        body = (f'<Response><Errors><Error><Code>{code}</Code><Message>{escape(message)}</Message></Error></Errors>'
+                '<RequestID>bench</RequestID></Response>')
+    else:
+        body = (f'<ErrorResponse><Error><Type>Sender</Type><Code>{code}</Code><Message>{escape(message)}</Message>'
+                '</Error><RequestId>bench</RequestId></ErrorResponse>')
+    return AWSResponse(request.url, status, _Headers(), _RawBody(body.encode()))
+
+def _tag_params(params, prefix):
+    tags = {}
+    for key, value in params.items():
+        if key.startswith(prefix) and key.endswith('.Key'):
+            tags[value] = params.get(key[:-4] + '.Value', '')
+    return tags
+
+class _RawBody:
+    def __init__(self, data):
+        self._data = data
+
+    def stream(self, **kwargs):
+        yield self._data
+
+def _xml_value(shape, value, name, ec2):
+    if value is None:
+        return ''
+    if shape.type_name == 'structure':
+        children = ''.join(
+            _xml_value(member, value[key], member.serialization.get('name', key), ec2)
+            for key, member in shape.members.items() if key in value
+        )
+        return f'<{name}>{children}</{name}>'
+    if shape.type_name == 'list':
+        item = 'item' if ec2 else shape.member.serialization.get('name', 'member')
+        return f'<{name}>' + ''.join(_xml_value(shape.member, v, item, ec2) for v in value) + f'</{name}>'
+    if shape.type_name == 'timestamp':
+        text = value.strftime('%Y-%m-%dT%H:%M:%S.000Z') if isinstance(value, datetime) else value
+    elif shape.type_name == 'boolean':
+        text = 'true' if value else 'false'
+    else:
+        text = escape(str(value))
+    return f'<{name}>{text}</{name}>'
+
+def _serialize(service_model, operation, result):
+    shape = operation.output_shape
+    ec2 = service_model.protocol == 'ec2'
+    members = ''.join(
+        _xml_value(member, result[key], member.serialization.get('name', key), ec2)
+        for key, member in (shape.members.items() if shape else ()) if result.get(key) is not None
+    )
+    if ec2:
+        return f'<{operation.name}Response><requestId>bench</requestId>{members}</{operation.name}Response>'
+    wrapper = shape.serialization.get('resultWrapper', f'{operation.name}Result') if shape else f'{operation.name}Result'
+    return (f'<{operation.name}Response><{wrapper}>{members}</{wrapper}>'
+            f'<ResponseMetadata><RequestId>bench</RequestId></ResponseMetadata></{operation.name}Response>')
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def run_scenario(name, func, iterations, setup=None, ops_per_iteration=1):
+    latencies = []
+    tracemalloc.start()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        if setup:
+            setup()
+        call_started = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'scenario': name,
+        'iterations': iterations,
+        'throughput_ops_per_s': round(iterations * ops_per_iteration / sum(latencies), 3) if sum(latencies) else None,
+        'p50_ms': round(_percentile(latencies, 0.5) * 1000, 3),
+        'p99_ms': round(_percentile(latencies, 0.99) * 1000, 3),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 3),
+        'wall_s': round(elapsed, 3),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+def run_benchmarks(size, iterations=5, latency=0.0, jitter=0.0, throttle_rate=0.0, pending_seconds=0.3, fleet_size=20):
+    backend = FakeAWSBackend(size, latency, jitter, throttle_rate, pending_seconds)
+    # Distinct fake credentials per size keep pooled clients and caches apart
+    key, secret = f'BENCH{size.upper()}', f'bench-secret-{size}'
+    ec2_launcher.TRACKER_MIN_INTERVAL = min(ec2_launcher.TRACKER_MIN_INTERVAL, max(0.05, pending_seconds / 4))
+    ec2_launcher.WARM_POOL_REPLENISH_INTERVAL = min(ec2_launcher.WARM_POOL_REPLENISH_INTERVAL, max(0.1, pending_seconds))
+    backend.attach(ec2_launcher.get_ec2_client(key, secret, BENCH_REGION))
+    backend.attach(ec2_launcher.get_iam_client(key, secret, BENCH_REGION))
+    backend.attach(ec2_launcher.get_ec2_resource(key, secret, BENCH_REGION).meta.client)
+
+    def cold():
+        ec2_launcher.invalidate_cache(aws_access_key_id=key, aws_secret_access_key=secret)
+        for resource in resource_fetch.RESOURCES.values():
+            inventory_snapshot.invalidate_snapshot(key, secret, BENCH_REGION, resource)
+
+    def fetch_aws_resources():
+        # The same snapshot-backed parallel fetch, with per-lookup timeouts, that the app runs
+        _, _, errors = resource_fetch.collect_resources(resource_fetch.start_resource_fetch(key, secret, BENCH_REGION))
+        if errors:
+            raise RuntimeError('; '.join(f'{name}: {error}' for name, error in errors.items()))
+
+    launch_args = dict(instance_type='t3.micro', ami_id='ami-00000001', key_name='key-0')
+    launched = []
+
+    def launch_single():
+        info = ec2_launcher.launch_instance(key, secret, BENCH_REGION, **launch_args)
+        if 'Error' in info:
+            raise RuntimeError(info['Error'])
+        launched.append(info['Instance ID'])
+
+    def launch_warm():
+        info = ec2_launcher.launch_instance(key, secret, BENCH_REGION, warm_pool=True, **launch_args)
+        if 'Error' in info:
+            raise RuntimeError(info['Error'])
+        launched.append(info['Instance ID'])
+
+    def fill_warm_pool(size):
+        profile_id = ec2_launcher.configure_warm_pool(key, secret, BENCH_REGION, size, **launch_args)
+        deadline = time.monotonic() + WARM_POOL_FILL_TIMEOUT
+        while time.monotonic() < deadline:
+            profile = ec2_launcher.get_warm_pool_stats(key, secret, BENCH_REGION)['Profiles'].get(profile_id)
+            if profile is None or profile['Ready'] >= size:
+                return
+            time.sleep(0.05)
+        raise RuntimeError('Warm pool did not fill in time')
+
+    def launch_fleet():
+        fleet = ec2_launcher.launch_instances(key, secret, BENCH_REGION, count=fleet_size, **launch_args)
+        if fleet['Failures']:
+            raise RuntimeError(fleet['Failures'][0])
+        launched.extend(instance['Instance ID'] for instance in fleet['Instances'])
+
+    def terminate_all():
+        outcome = ec2_launcher.terminate_instances(key, secret, BENCH_REGION, list(launched), wait=True)
+        if outcome['Summary']['Failed']:
+            raise RuntimeError(f"{outcome['Summary']['Failed']} instances failed to terminate")
+        launched.clear()
+
+    metrics.reset()
+    results = [
+        run_scenario('fetch_aws_resources:cold', fetch_aws_resources, iterations, setup=cold),
+        run_scenario('fetch_aws_resources:warm', fetch_aws_resources, iterations),
+    ]
+    for family in ec2_launcher.AMI_FAMILIES:
+        results.append(run_scenario(
+            f'ami_lookup:{family}',
+            lambda family=family: ec2_launcher.get_recent_amis(key, secret, BENCH_REGION, family),
+            iterations, setup=cold
+        ))
+    results.append(run_scenario('launch_instance:single', launch_single, iterations))
+    fill_warm_pool(iterations)
+    results.append(run_scenario('launch_instance:warm', launch_warm, iterations))
+    ec2_launcher.configure_warm_pool(key, secret, BENCH_REGION, 0, **launch_args)
+    results.append(run_scenario('launch_instances:fleet', launch_fleet, max(1, iterations // 2), ops_per_iteration=fleet_size))
+    results.append(run_scenario('terminate_instances:bulk', terminate_all, 1, ops_per_iteration=max(1, len(launched))))
+    throttles = sum(c['value'] for c in metrics.snapshot()['counters'] if c['name'] == 'aws_throttles_total')
+    return {
+        'size': size,
+        'account': ACCOUNT_SIZES[size],
+        'latency_s': latency,
+        'jitter_s': jitter,
+        'throttle_rate': throttle_rate,
+        'throttle_events': throttles,
+        'results': results,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Offline benchmarks for ec2_launcher against a synthetic AWS backend.')
+    parser.add_argument('--sizes', nargs='+', default=list(ACCOUNT_SIZES), choices=list(ACCOUNT_SIZES))
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every simulated API call')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Extra random latency, uniform in [0, jitter]')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fraction of calls answered with RequestLimitExceeded')
+    parser.add_argument('--pending-seconds', type=float, default=0.3, help='How long simulated instances stay pending')
+    parser.add_argument('--fleet-size', type=int, default=20)
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    args = parser.parse_args(argv)
+
+    # Snapshots go to a scratch directory, not the app's cache
+    with tempfile.TemporaryDirectory(prefix='ec2-bench-') as snapshot_dir:
+        inventory_snapshot.SNAPSHOT_DIR = snapshot_dir
+        report = {
+            'generated_at': datetime.now(timezone.utc).isoformat(),
+            'runs': [
+                run_benchmarks(size, args.iterations, args.latency, args.jitter, args.throttle_rate,
+                               args.pending_seconds, args.fleet_size)
+                for size in args.sizes
+            ],
+        }
+    data = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(data)
+    else:
+        print(data)
+
+if __name__ == '__main__':
+    main()
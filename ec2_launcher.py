@@ -1,123 +1,1048 @@
-import boto3
+import hashlib
+import heapq
+import itertools
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 
-def get_ec2_client(aws_access_key_id, aws_secret_access_key, region):
-    return boto3.client(
-        'ec2',
-        aws_access_key_id=aws_access_key_id,
-        aws_secret_access_key=aws_secret_access_key,
-        region_name=region
+from botocore.exceptions import ClientError
+
+import metrics
+from inventory_model import build_security_group_index, build_subnet_index
+
+MAX_POOLED_CLIENTS = 32
+MAX_POOL_CONNECTIONS = 10
+RETRY_MAX_ATTEMPTS = 6
+
+_pool_lock = threading.Lock()
+_client_pool = OrderedDict()
+_session_pool = {}
+_pool_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+THROTTLE_ERROR_CODES = ('RequestLimitExceeded', 'Throttling', 'ThrottlingException')
+PRIORITY_URGENT = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BACKGROUND = 2
+API_FAMILY_RATES = {
+    'describe': (20.0, 50),
+    'run': (2.0, 5),
+    'instance-state': (5.0, 10),
+    'mutate': (5.0, 10),
+    'iam': (5.0, 10),
+}
+URGENT_OPERATIONS = ('TerminateInstances', 'StopInstances')
+RATE_LIMIT_FLOOR = 0.2
+RATE_RECOVERY_STEP = 0.05
+
+class TokenBucket:
+    # Refills at an adaptive rate: halves on throttling, creeps back on success.
+    # Waiters are served in (priority, arrival) order.
+
+    def __init__(self, rate, burst):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._condition = threading.Condition()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self.stats = {'calls': 0, 'throttles': 0, 'queued_seconds': 0.0, 'max_queued_seconds': 0.0}
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority=PRIORITY_NORMAL):
+        ticket = (priority, next(self._sequence))
+        started = time.monotonic()
+        with self._condition:
+            heapq.heappush(self._waiters, ticket)
+            while True:
+                self._refill()
+                if self._waiters[0] == ticket and self._tokens >= 1:
+                    heapq.heappop(self._waiters)
+                    self._tokens -= 1
+                    break
+                self._condition.wait(max(0.005, (1 - self._tokens) / self.rate))
+            queued = time.monotonic() - started
+            self.stats['calls'] += 1
+            self.stats['queued_seconds'] += queued
+            self.stats['max_queued_seconds'] = max(self.stats['max_queued_seconds'], queued)
+            self._condition.notify_all()
+        return queued
+
+    def on_throttle(self):
+        with self._condition:
+            self.stats['throttles'] += 1
+            self.rate = max(RATE_LIMIT_FLOOR, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+
+    def on_success(self):
+        if self.rate < self.max_rate:
+            with self._condition:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * RATE_RECOVERY_STEP)
+
+_buckets_lock = threading.Lock()
+_rate_buckets = {}
+_call_context = threading.local()
+
+def _api_family(service, operation):
+    if service == 'iam':
+        return 'iam'
+    if operation.startswith('Describe'):
+        return 'describe'
+    if operation == 'RunInstances':
+        return 'run'
+    if operation in ('StartInstances', 'StopInstances', 'TerminateInstances'):
+        return 'instance-state'
+    return 'mutate'
+
+def _get_bucket(fingerprint, region, family):
+    key = (fingerprint, region, family)
+    with _buckets_lock:
+        bucket = _rate_buckets.get(key)
+        if bucket is None:
+            bucket = _rate_buckets[key] = TokenBucket(*API_FAMILY_RATES[family])
+    return bucket
+
+@contextmanager
+def api_priority(priority):
+    previous = getattr(_call_context, 'priority', None)
+    _call_context.priority = priority
+    try:
+        yield
+    finally:
+        _call_context.priority = previous
+
+def _install_rate_limiter(client, fingerprint, region):
+    service = client.meta.service_model.service_name
+    # The account ID is not known without an STS call, so the credentials fingerprint stands in for it
+    bucket_region = None if service == 'iam' else region
+
+    def before_send(event_name, **kwargs):
+        operation = event_name.rsplit('.', 1)[-1]
+        priority = _current_priority()
+        if priority is None:
+            priority = PRIORITY_URGENT if operation in URGENT_OPERATIONS else PRIORITY_NORMAL
+        family = _api_family(service, operation)
+        queued = _get_bucket(fingerprint, bucket_region, family).acquire(priority)
+        metrics.observe('rate_limit_wait_seconds', queued, family=family)
+
+    def needs_retry(event_name, response=None, **kwargs):
+        operation = event_name.rsplit('.', 1)[-1]
+        bucket = _get_bucket(fingerprint, bucket_region, _api_family(service, operation))
+        error_code = response[1].get('Error', {}).get('Code') if response else None
+        if error_code in THROTTLE_ERROR_CODES:
+            bucket.on_throttle()
+            metrics.inc('aws_throttles_total', service=service, operation=operation)
+        elif response is not None and error_code is None:
+            bucket.on_success()
+
+    client.meta.events.register('before-send', before_send)
+    client.meta.events.register('needs-retry', needs_retry)
+
+MAX_TIMING_SCOPES = 256
+_scope_timings_lock = threading.Lock()
+_scope_timings = OrderedDict()
+
+def set_api_scope(scope):
+    # Calls made from this thread, and from pool work it submits, are timed under scope
+    _call_context.scope = scope
+
+def _current_scope():
+    return getattr(_call_context, 'scope', None)
+
+def _record_scoped_call(scope, service, operation, seconds):
+    with _scope_timings_lock:
+        timings = _scope_timings.get(scope)
+        if timings is None:
+            timings = _scope_timings[scope] = {}
+            while len(_scope_timings) > MAX_TIMING_SCOPES:
+                _scope_timings.popitem(last=False)
+        totals = timings.setdefault((service, operation), [0, 0.0])
+        totals[0] += 1
+        totals[1] += seconds
+
+def get_scope_timings(scope):
+    # (service, operation) -> (calls, seconds) for the calls finished so far under scope
+    with _scope_timings_lock:
+        return {key: tuple(totals) for key, totals in _scope_timings.get(scope, {}).items()}
+
+def _install_instrumentation(client):
+    service = client.meta.service_model.service_name
+
+    def observe_call(context, operation):
+        started = context.get('metrics_started')
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        metrics.observe('aws_call_seconds', elapsed, service=service, operation=operation)
+        if context.get('metrics_scope') is not None:
+            _record_scoped_call(context['metrics_scope'], service, operation, elapsed)
+
+    def before_call(model, context, **kwargs):
+        context['metrics_started'] = time.perf_counter()
+        context['metrics_scope'] = _current_scope()
+
+    def after_call(model, http_response, parsed, context, **kwargs):
+        observe_call(context, model.name)
+        error_code = parsed.get('Error', {}).get('Code')
+        metrics.inc('aws_calls_total', service=service, operation=model.name, outcome='error' if error_code else 'ok')
+        if error_code:
+            metrics.inc('aws_errors_total', service=service, operation=model.name, code=error_code)
+        retries = parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+        if retries:
+            metrics.inc('aws_retries_total', retries, service=service, operation=model.name)
+        try:
+            received = len(http_response.content or b'')
+        except Exception:
+            received = 0
+        metrics.inc('aws_response_bytes_total', received, service=service, operation=model.name)
+
+    def after_call_error(event_name, exception, context, **kwargs):
+        # botocore emits this event without the operation model; the name ends the event
+        operation = event_name.rsplit('.', 1)[-1]
+        observe_call(context, operation)
+        metrics.inc('aws_calls_total', service=service, operation=operation, outcome='error')
+        metrics.inc('aws_errors_total', service=service, operation=operation, code=type(exception).__name__)
+
+    client.meta.events.register('before-call', before_call)
+    client.meta.events.register('after-call', after_call)
+    client.meta.events.register('after-call-error', after_call_error)
+
+def get_rate_limiter_stats():
+    with _buckets_lock:
+        buckets = list(_rate_buckets.items())
+    stats = {}
+    for (fingerprint, region, family), bucket in buckets:
+        entry = dict(bucket.stats)
+        entry['rate'] = round(bucket.rate, 3)
+        stats[f'{fingerprint}/{region or "global"}/{family}'] = entry
+    return stats
+
+def _credentials_fingerprint(aws_access_key_id, aws_secret_access_key):
+    # Keys never sit in the pool index in clear text
+    return hashlib.sha256(f"{aws_access_key_id}:{aws_secret_access_key}".encode()).hexdigest()[:16]
+
+def _client_config():
+    from botocore.config import Config
+    # Standard retry mode backs off with full jitter; pacing is left to the shared rate limiter
+    return Config(
+        max_pool_connections=MAX_POOL_CONNECTIONS,
+        tcp_keepalive=True,
+        retries={'mode': 'standard', 'max_attempts': RETRY_MAX_ATTEMPTS}
     )
 
+def _get_session(fingerprint, aws_access_key_id, aws_secret_access_key, region):
+    # Sessions are not thread-safe, so each carries its own lock for client construction
+    # boto3 is imported on first use so the UI can paint before it loads
+    import boto3
+    with _pool_lock:
+        entry = _session_pool.get((fingerprint, region))
+        if entry is None:
+            session = boto3.session.Session(
+                aws_access_key_id=aws_access_key_id,
+                aws_secret_access_key=aws_secret_access_key,
+                region_name=region
+            )
+            entry = _session_pool[(fingerprint, region)] = (session, threading.Lock())
+    return entry
+
+def _get_pooled(kind, service, aws_access_key_id, aws_secret_access_key, region):
+    fingerprint = _credentials_fingerprint(aws_access_key_id, aws_secret_access_key)
+    key = (fingerprint, region, service, kind)
+    with _pool_lock:
+        pooled = _client_pool.get(key)
+        if pooled is not None:
+            _client_pool.move_to_end(key)
+            _pool_stats['hits'] += 1
+            return pooled
+        _pool_stats['misses'] += 1
+    session, session_lock = _get_session(fingerprint, aws_access_key_id, aws_secret_access_key, region)
+    with session_lock, metrics.timed('client_build_seconds', service=service, kind=kind):
+        if kind == 'resource':
+            created = session.resource(service, config=_client_config())
+            client = created.meta.client
+        else:
+            created = client = session.client(service, config=_client_config())
+        _install_rate_limiter(client, fingerprint, region)
+        _install_instrumentation(client)
+    with _pool_lock:
+        # Another thread may have won the race; keep the first one so connections are shared
+        pooled = _client_pool.setdefault(key, created)
+        _client_pool.move_to_end(key)
+        while len(_client_pool) > MAX_POOLED_CLIENTS:
+            (old_fp, old_region, _, _), _ = _client_pool.popitem(last=False)
+            _pool_stats['evictions'] += 1
+            if not any(k[:2] == (old_fp, old_region) for k in _client_pool):
+                _session_pool.pop((old_fp, old_region), None)
+    return pooled
+
+def configure_client_pool(max_clients=None, max_pool_connections=None):
+    global MAX_POOLED_CLIENTS, MAX_POOL_CONNECTIONS
+    if max_clients is not None:
+        MAX_POOLED_CLIENTS = max(1, int(max_clients))
+    if max_pool_connections is not None:
+        MAX_POOL_CONNECTIONS = max(1, int(max_pool_connections))
+    # Existing clients were built with the old connection settings
+    clear_client_pool()
+
+def clear_client_pool():
+    with _pool_lock:
+        _client_pool.clear()
+        _session_pool.clear()
+
+def get_client_pool_stats():
+    with _pool_lock:
+        stats = dict(_pool_stats)
+        stats['size'] = len(_client_pool)
+        stats['max_size'] = MAX_POOLED_CLIENTS
+        stats['max_pool_connections'] = MAX_POOL_CONNECTIONS
+    return stats
+
+CACHE_TTLS = {
+    'key_pairs': 300,
+    'security_groups': 120,
+    'subnets': 300,
+    'iam_roles': 600,
+}
+DEFAULT_CACHE_TTL = 120
+MAX_CACHE_ENTRIES = 256
+
+_cache_lock = threading.Lock()
+_inventory_cache = OrderedDict()
+_cache_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+# Loaders may legitimately return None (an unknown AMI or instance type), so a miss needs its own marker
+_MISS = object()
+
+def _copy_cached(value):
+    # Lists are handed out as copies; index objects are read-only and shared as-is
+    return list(value) if isinstance(value, list) else value
+
+def _cached_lookup(resource, aws_access_key_id, aws_secret_access_key, region, loader, return_source=False, ttl=None):
+    key = (resource, _credentials_fingerprint(aws_access_key_id, aws_secret_access_key), region)
+    with _cache_lock:
+        entry = _inventory_cache.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            _inventory_cache.move_to_end(key)
+            _cache_stats['hits'] += 1
+            value, source = _copy_cached(entry[1]), 'cache'
+        else:
+            _cache_stats['misses'] += 1
+            value = _MISS
+    if value is _MISS:
+        with metrics.timed('inventory_lookup_seconds', resource=resource):
+            fetched = loader()
+        with _cache_lock:
+            if ttl is None:
+                ttl = CACHE_TTLS.get(resource, DEFAULT_CACHE_TTL)
+            _inventory_cache[key] = (time.monotonic() + ttl, fetched)
+            _inventory_cache.move_to_end(key)
+            while len(_inventory_cache) > MAX_CACHE_ENTRIES:
+                _inventory_cache.popitem(last=False)
+        value, source = _copy_cached(fetched), 'aws'
+    metrics.inc('inventory_lookups_total', resource=resource, source=source)
+    return (value, source) if return_source else value
+
+def invalidate_cache(resource=None, aws_access_key_id=None, aws_secret_access_key=None, region=None):
+    fingerprint = None
+    if aws_access_key_id is not None:
+        fingerprint = _credentials_fingerprint(aws_access_key_id, aws_secret_access_key)
+    with _cache_lock:
+        stale = [
+            key for key in _inventory_cache
+            if (resource is None or key[0] == resource or key[0].startswith(f'{resource}:'))
+            and (fingerprint is None or key[1] == fingerprint)
+            and (region is None or key[2] == region)
+        ]
+        for key in stale:
+            del _inventory_cache[key]
+        _cache_stats['invalidations'] += len(stale)
+    return len(stale)
+
+def get_cache_stats():
+    with _cache_lock:
+        stats = dict(_cache_stats)
+        stats['size'] = len(_inventory_cache)
+        stats['max_size'] = MAX_CACHE_ENTRIES
+    return stats
+
+FETCH_WORKERS = 8
+PREFLIGHT_WORKERS = 12
+
+_fetch_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix='ec2-fetch')
+# Preflight sits on the launch path, so it never queues behind inventory and AMI fetches
+_preflight_executor = ThreadPoolExecutor(max_workers=PREFLIGHT_WORKERS, thread_name_prefix='ec2-preflight')
+
+def _current_priority():
+    return getattr(_call_context, 'priority', None)
+
+def _with_priority(func, priority):
+    # Priority and timing scope are thread-local, so work handed to a pool has to carry the caller's along
+    scope = _current_scope()
+    def call(*args, **kwargs):
+        previous_scope = _current_scope()
+        _call_context.scope = scope
+        try:
+            with api_priority(priority):
+                return func(*args, **kwargs)
+        finally:
+            _call_context.scope = previous_scope
+    return call
+
+class _StartClock:
+    # Wraps a pooled call and records when a worker picks it up
+    def __init__(self, func):
+        self.func = func
+        self.started = None
+
+    def __call__(self):
+        self.started = time.monotonic()
+        return self.func()
+
+def submit_parallel(calls, priority=None, executor=None):
+    if priority is None:
+        priority = _current_priority()
+    executor = executor or _fetch_executor
+    futures = {}
+    for name, func in calls.items():
+        clock = _StartClock(_with_priority(func, priority))
+        futures[name] = executor.submit(clock)
+        futures[name].clock = clock
+    return futures
+
+def iter_parallel(futures, timeout=None, timeouts=None):
+    # Yields (name, value, error) as each call finishes; a slow call only times out itself.
+    # A call's timeout runs from when a worker starts it, so time spent queued behind
+    # other work does not count against it.
+    timeouts = timeouts or {}
+    seen = time.monotonic()
+    pending = {future: name for name, future in futures.items()}
+    limits = {future: timeouts.get(name, timeout) for future, name in pending.items()}
+
+    def deadline(future, now):
+        clock = getattr(future, 'clock', None)
+        if clock is None:
+            return seen + limits[future]
+        # Not started yet: it cannot expire sooner than a full timeout from now
+        return (clock.started if clock.started is not None else now) + limits[future]
+
+    while pending:
+        now = time.monotonic()
+        active = [deadline(f, now) for f in pending if limits[f] is not None]
+        wait_for = max(0, min(active) - now) if active else None
+        done, _ = wait(list(pending), timeout=wait_for, return_when=FIRST_COMPLETED)
+        for future in done:
+            name = pending.pop(future)
+            error = future.exception()
+            yield name, (None if error else future.result()), error
+        now = time.monotonic()
+        for future in [f for f in pending if limits[f] is not None and deadline(f, now) <= now]:
+            name = pending.pop(future)
+            future.cancel()
+            yield name, None, TimeoutError(f"{name} did not finish within {limits[future]}s")
+
+def get_ec2_client(aws_access_key_id, aws_secret_access_key, region):
+    return _get_pooled('client', 'ec2', aws_access_key_id, aws_secret_access_key, region)
+
+def get_ec2_resource(aws_access_key_id, aws_secret_access_key, region):
+    return _get_pooled('resource', 'ec2', aws_access_key_id, aws_secret_access_key, region)
+
 def create_key_pair(aws_access_key_id, aws_secret_access_key, region, key_name):
     ec2_client = get_ec2_client(aws_access_key_id, aws_secret_access_key, region)
     response = ec2_client.create_key_pair(KeyName=key_name)
+    invalidate_cache('key_pairs', aws_access_key_id, aws_secret_access_key, region)
     return response['KeyMaterial']
 
 def get_iam_client(aws_access_key_id, aws_secret_access_key, region):
-    return boto3.client(
-        'iam',
-        aws_access_key_id=aws_access_key_id,
-        aws_secret_access_key=aws_secret_access_key,
-        region_name=region
-    )
+    return _get_pooled('client', 'iam', aws_access_key_id, aws_secret_access_key, region)
 
-def get_recent_ubuntu_amis(aws_access_key_id, aws_secret_access_key, region, count=3):
-    ec2_client = get_ec2_client(aws_access_key_id, aws_secret_access_key, region)
-    response = ec2_client.describe_images(
-        Owners=['099720109477'],
+AMI_FAMILIES = {
+    'ubuntu': {
+        'label': 'Ubuntu 22.04',
+        'owner': '099720109477',
+        'name': 'ubuntu/images/hvm-ssd/ubuntu-22.04-amd64-server-*',
+        'architecture': 'x86_64',
+    },
+    'amazon_linux': {
+        'label': 'Amazon Linux 2',
+        'owner': '137112412989',
+        'name': 'amzn2-ami-hvm-*-x86_64-gp2',
+        'architecture': 'x86_64',
+    },
+    'rhel': {
+        'label': 'RHEL',
+        'owner': '309956199498',
+        'name': 'RHEL-8.*x86_64*',
+        'architecture': 'x86_64',
+    },
+    'windows': {
+        'label': 'Windows',
+        'owner': '801119661308',
+        'name': 'Windows_Server-2022-English-Full-Base-*',
+        'architecture': 'x86_64',
+    },
+    'macos': {
+        'label': 'macOS',
+        'owner': '679593333241',
+        'name': 'amzn-ec2-macos-*-x86_64',
+        'architecture': 'x86_64_mac',
+    },
+}
+AMI_CATALOG_TTL = 900
+AMI_PAGE_SIZE = 200
+
+def _iter_family_images(ec2_client, family):
+    spec = AMI_FAMILIES[family]
+    paginator = ec2_client.get_paginator('describe_images')
+    pages = paginator.paginate(
+        Owners=[spec['owner']],
         Filters=[
-            {'Name': 'name', 'Values': ['ubuntu/images/hvm-ssd/ubuntu-22.04-amd64-server-*']},
+            {'Name': 'name', 'Values': [spec['name']]},
+            {'Name': 'architecture', 'Values': [spec['architecture']]},
             {'Name': 'state', 'Values': ['available']}
-        ]
+        ],
+        PaginationConfig={'PageSize': AMI_PAGE_SIZE}
     )
-    images = sorted(response['Images'], key=lambda x: x['CreationDate'], reverse=True)
-    return [{"ImageId": img["ImageId"], "Name": img["Name"]} for img in images[:count]]
+    # Project each page down to the three fields we rank on before it is kept
+    for creation_date, image_id, name in pages.search('Images[].[CreationDate, ImageId, Name]'):
+        yield creation_date, image_id, name
 
-def get_recent_amazon_linux_amis(aws_access_key_id, aws_secret_access_key, region, count=3):
-    ec2_client = get_ec2_client(aws_access_key_id, aws_secret_access_key, region)
-    response = ec2_client.describe_images(
-        Owners=['137112412989'],
-        Filters=[
-            {'Name': 'name', 'Values': ['amzn2-ami-hvm-*-x86_64-gp2']},
-            {'Name': 'state', 'Values': ['available']}
-        ]
+def get_recent_amis(aws_access_key_id, aws_secret_access_key, region, family, count=3, return_source=False):
+    if family not in AMI_FAMILIES:
+        raise ValueError(f"Unknown AMI family: {family}")
+    def load():
+        ec2_client = get_ec2_client(aws_access_key_id, aws_secret_access_key, region)
+        newest = heapq.nlargest(count, _iter_family_images(ec2_client, family))
+        return [{"ImageId": image_id, "Name": name, "CreationDate": created} for created, image_id, name in newest]
+    return _cached_lookup(
+        f'amis:{family}:{count}', aws_access_key_id, aws_secret_access_key, region,
+        load, return_source, ttl=AMI_CATALOG_TTL
     )
-    images = sorted(response['Images'], key=lambda x: x['CreationDate'], reverse=True)
-    return [{"ImageId": img["ImageId"], "Name": img["Name"]} for img in images[:count]]
+
+def get_recent_ubuntu_amis(aws_access_key_id, aws_secret_access_key, region, count=3):
+    return get_recent_amis(aws_access_key_id, aws_secret_access_key, region, 'ubuntu', count)
+
+def get_recent_amazon_linux_amis(aws_access_key_id, aws_secret_access_key, region, count=3):
+    return get_recent_amis(aws_access_key_id, aws_secret_access_key, region, 'amazon_linux', count)
 
 def get_recent_rhel_amis(aws_access_key_id, aws_secret_access_key, region, count=3):
-    ec2_client = get_ec2_client(aws_access_key_id, aws_secret_access_key, region)
-    response = ec2_client.describe_images(
-        Owners=['309956199498'],
-        Filters=[
-            {'Name': 'name', 'Values': ['RHEL-8.*x86_64*']},
-            {'Name': 'state', 'Values': ['available']}
-        ]
-    )
-    images = sorted(response['Images'], key=lambda x: x['CreationDate'], reverse=True)
-    return [{"ImageId": img["ImageId"], "Name": img["Name"]} for img in images[:count]]
+    return get_recent_amis(aws_access_key_id, aws_secret_access_key, region, 'rhel', count)
 
 def get_recent_windows_amis(aws_access_key_id, aws_secret_access_key, region, count=3):
-    ec2_client = get_ec2_client(aws_access_key_id, aws_secret_access_key, region)
-    response = ec2_client.describe_images(
-        Owners=['801119661308'],
-        Filters=[
-            {'Name': 'name', 'Values': ['Windows_Server-2022-English-Full-Base-*']},
-            {'Name': 'state', 'Values': ['available']}
-        ]
-    )
-    images = sorted(response['Images'], key=lambda x: x['CreationDate'], reverse=True)
-    return [{"ImageId": img["ImageId"], "Name": img["Name"]} for img in images[:count]]
+    return get_recent_amis(aws_access_key_id, aws_secret_access_key, region, 'windows', count)
 
 def get_recent_macos_amis(aws_access_key_id, aws_secret_access_key, region, count=3):
-    ec2_client = get_ec2_client(aws_access_key_id, aws_secret_access_key, region)
-    response = ec2_client.describe_images(
-        Owners=['679593333241'],
-        Filters=[
-            {'Name': 'name', 'Values': ['amzn-ec2-macos-*-x86_64']},
-            {'Name': 'state', 'Values': ['available']}
-        ]
-    )
-    images = sorted(response['Images'], key=lambda x: x['CreationDate'], reverse=True)
-    return [{"ImageId": img["ImageId"], "Name": img["Name"]} for img in images[:count]]
+    return get_recent_amis(aws_access_key_id, aws_secret_access_key, region, 'macos', count)
 
 def get_latest_ubuntu_ami(aws_access_key_id, aws_secret_access_key, region):
-    ec2_client = get_ec2_client(aws_access_key_id, aws_secret_access_key, region)
-    response = ec2_client.describe_images(
-        Owners=['099720109477'],
-        Filters=[
-            {'Name': 'name', 'Values': ['ubuntu/images/hvm-ssd/ubuntu-22.04-amd64-server-*']},
-            {'Name': 'state', 'Values': ['available']}
-        ]
-    )
-    images = sorted(response['Images'], key=lambda x: x['CreationDate'], reverse=True)
+    images = get_recent_amis(aws_access_key_id, aws_secret_access_key, region, 'ubuntu', 1)
     return images[0]['ImageId'] if images else None
 
-def get_key_pairs(aws_access_key_id, aws_secret_access_key, region):
+INVENTORY_PAGE_SIZE = 500
+
+def _project(item, fields):
+    if fields is None:
+        return item
+    return {field: item.get(field) for field in fields}
+
+def _inventory_filters(vpc_id=None, tags=None, name_filter=None, name_prefix=None):
+    filters = []
+    if vpc_id:
+        filters.append({'Name': 'vpc-id', 'Values': [vpc_id]})
+    for key, value in (tags or {}).items():
+        values = [value] if isinstance(value, str) else list(value)
+        filters.append({'Name': f'tag:{key}', 'Values': values})
+    if name_prefix:
+        filters.append({'Name': name_filter, 'Values': [f'{name_prefix}*']})
+    return filters
+
+def _iter_paginated(aws_access_key_id, aws_secret_access_key, region, operation, result_key, filters, page_size, fields):
     ec2_client = get_ec2_client(aws_access_key_id, aws_secret_access_key, region)
-    response = ec2_client.describe_key_pairs()
-    return [kp['KeyName'] for kp in response['KeyPairs']]
+    paginator = ec2_client.get_paginator(operation)
+    for page in paginator.paginate(Filters=filters, PaginationConfig={'PageSize': page_size}):
+        metrics.inc('pagination_pages_total', operation=operation)
+        for item in page[result_key]:
+            yield _project(item, fields)
+
+def iter_security_groups(aws_access_key_id, aws_secret_access_key, region, vpc_id=None, tags=None,
+                         name_prefix=None, page_size=INVENTORY_PAGE_SIZE, fields=None):
+    filters = _inventory_filters(vpc_id, tags, 'group-name', name_prefix)
+    return _iter_paginated(
+        aws_access_key_id, aws_secret_access_key, region,
+        'describe_security_groups', 'SecurityGroups', filters, page_size, fields
+    )
 
-def get_security_groups(aws_access_key_id, aws_secret_access_key, region):
+def iter_subnets(aws_access_key_id, aws_secret_access_key, region, vpc_id=None, tags=None,
+                 name_prefix=None, page_size=INVENTORY_PAGE_SIZE, fields=None):
+    filters = _inventory_filters(vpc_id, tags, 'tag:Name', name_prefix)
+    return _iter_paginated(
+        aws_access_key_id, aws_secret_access_key, region,
+        'describe_subnets', 'Subnets', filters, page_size, fields
+    )
+
+def iter_key_pairs(aws_access_key_id, aws_secret_access_key, region, tags=None, name_prefix=None, fields=None):
+    # DescribeKeyPairs is not paginated, but filtering still happens server-side
     ec2_client = get_ec2_client(aws_access_key_id, aws_secret_access_key, region)
-    response = ec2_client.describe_security_groups()
-    return [{'GroupId': sg['GroupId'], 'GroupName': sg['GroupName']} for sg in response['SecurityGroups']]
+    response = ec2_client.describe_key_pairs(Filters=_inventory_filters(None, tags, 'key-name', name_prefix))
+    for kp in response['KeyPairs']:
+        yield _project(kp, fields)
+
+def get_key_pairs(aws_access_key_id, aws_secret_access_key, region, return_source=False):
+    def load():
+        return [kp['KeyName'] for kp in iter_key_pairs(aws_access_key_id, aws_secret_access_key, region, fields=('KeyName',))]
+    return _cached_lookup('key_pairs', aws_access_key_id, aws_secret_access_key, region, load, return_source)
+
+def get_security_groups(aws_access_key_id, aws_secret_access_key, region, return_source=False):
+    def load():
+        return list(iter_security_groups(
+            aws_access_key_id, aws_secret_access_key, region, fields=('GroupId', 'GroupName', 'VpcId')
+        ))
+    return _cached_lookup('security_groups', aws_access_key_id, aws_secret_access_key, region, load, return_source)
+
+def get_subnets(aws_access_key_id, aws_secret_access_key, region, return_source=False):
+    def load():
+        return list(iter_subnets(
+            aws_access_key_id, aws_secret_access_key, region,
+            fields=('SubnetId', 'CidrBlock', 'VpcId', 'AvailabilityZone', 'Tags')
+        ))
+    return _cached_lookup('subnets', aws_access_key_id, aws_secret_access_key, region, load, return_source)
+
+def get_security_group_index(aws_access_key_id, aws_secret_access_key, region, return_source=False):
+    def load():
+        return build_security_group_index(get_security_groups(aws_access_key_id, aws_secret_access_key, region))
+    return _cached_lookup(
+        'security_groups:index', aws_access_key_id, aws_secret_access_key, region, load, return_source,
+        ttl=CACHE_TTLS['security_groups']
+    )
+
+def get_subnet_index(aws_access_key_id, aws_secret_access_key, region, return_source=False):
+    def load():
+        return build_subnet_index(get_subnets(aws_access_key_id, aws_secret_access_key, region))
+    return _cached_lookup(
+        'subnets:index', aws_access_key_id, aws_secret_access_key, region, load, return_source,
+        ttl=CACHE_TTLS['subnets']
+    )
+
+def get_iam_roles(aws_access_key_id, aws_secret_access_key, region, return_source=False):
+    def load():
+        iam_client = get_iam_client(aws_access_key_id, aws_secret_access_key, region)
+        paginator = iam_client.get_paginator('list_roles')
+        roles = []
+        for page in paginator.paginate():
+            for role in page['Roles']:
+                roles.append(role['RoleName'])
+        return roles
+    # IAM is global, so one entry serves every region
+    return _cached_lookup('iam_roles', aws_access_key_id, aws_secret_access_key, None, load, return_source)
+
+LAUNCH_WORKERS = 4
+ROOT_DEVICE_NAME = '/dev/xvda'
+
+def _chunks(items, size):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _instance_details(instance):
+    return {
+        'Instance ID': instance['InstanceId'],
+        'State': instance['State']['Name'],
+        'Type': instance['InstanceType'],
+        'Public IP': instance.get('PublicIpAddress'),
+        'AMI': instance['ImageId']
+    }
+
+TRACKER_CHUNK_SIZE = 200
+TRACKER_MIN_INTERVAL = 2
+TRACKER_MAX_INTERVAL = 15
+TRACKER_WAIT_TIMEOUT = 600
+FAILED_LAUNCH_STATES = ('shutting-down', 'terminated', 'stopping', 'stopped')
+
+class InstanceStateTracker:
+    # One poller per (credentials, region) batches every watched instance into
+    # filtered DescribeInstances calls, so API load grows with chunks, not instances.
+
+    def __init__(self, aws_access_key_id, aws_secret_access_key, region,
+                 min_interval=None, max_interval=None):
+        self.region = region
+        self._ec2_client = get_ec2_client(aws_access_key_id, aws_secret_access_key, region)
+        self._min_interval = TRACKER_MIN_INTERVAL if min_interval is None else min_interval
+        self._max_interval = TRACKER_MAX_INTERVAL if max_interval is None else max_interval
+        self._interval = self._min_interval
+        self._condition = threading.Condition()
+        self._wake = threading.Event()
+        self._watched = set()
+        self._latest = {}
+        self._subscribers = []
+        self._thread = None
+        self.stats = {'polls': 0, 'api_calls': 0, 'throttled': 0, 'errors': 0, 'events': 0}
+
+    def watch(self, instance_ids):
+        with self._condition:
+            # State recorded before the instance was last watched may be stale
+            for instance_id in instance_ids:
+                if instance_id not in self._watched:
+                    self._latest.pop(instance_id, None)
+            self._watched.update(instance_ids)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f'ec2-tracker-{self.region}', daemon=True)
+                self._thread.start()
+        self._interval = self._min_interval
+        self._wake.set()
+
+    def unwatch(self, instance_ids):
+        with self._condition:
+            self._watched.difference_update(instance_ids)
+
+    def subscribe(self, callback):
+        with self._condition:
+            self._subscribers.append(callback)
+        def unsubscribe():
+            with self._condition:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
+
+    def get(self, instance_id):
+        with self._condition:
+            return self._latest.get(instance_id)
+
+    def watching(self):
+        with self._condition:
+            return set(self._watched)
+
+    def wait_for(self, instance_ids, states=('running',), timeout=TRACKER_WAIT_TIMEOUT,
+                 failed_states=FAILED_LAUNCH_STATES):
+        instance_ids = list(instance_ids)
+        with self._condition:
+            added = [i for i in instance_ids if i not in self._watched]
+        self.watch(instance_ids)
+        finished_states = set(states) | (set(failed_states) - set(states))
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            def settled():
+                return all(
+                    self._latest.get(i) is not None and self._latest[i]['State'] in finished_states
+                    for i in instance_ids
+                )
+            while not settled():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            results = {i: self._latest.get(i) for i in instance_ids}
+            self._watched.difference_update(added)
+        return results
+
+    def _poll(self, instance_ids):
+        found = {}
+        for chunk in _chunks(instance_ids, TRACKER_CHUNK_SIZE):
+            self.stats['api_calls'] += 1
+            # A filter, unlike InstanceIds, tolerates IDs that are not visible yet
+            pages = self._ec2_client.get_paginator('describe_instances').paginate(
+                Filters=[{'Name': 'instance-id', 'Values': chunk}]
+            )
+            for page in pages:
+                for reservation in page['Reservations']:
+                    for instance in reservation['Instances']:
+                        found[instance['InstanceId']] = _instance_details(instance)
+        return found
 
-def get_subnets(aws_access_key_id, aws_secret_access_key, region):
+    def _run(self):
+        _call_context.priority = PRIORITY_BACKGROUND
+        try:
+            while True:
+                with self._condition:
+                    instance_ids = sorted(self._watched)
+                    if not instance_ids:
+                        self._thread = None
+                        return
+                self.stats['polls'] += 1
+                try:
+                    found = self._poll(instance_ids)
+                except Exception as e:
+                    # A failed poll (throttling, timeouts, dropped connections) must not kill the poller
+                    if isinstance(e, ClientError) and e.response.get('Error', {}).get('Code') in THROTTLE_ERROR_CODES:
+                        self.stats['throttled'] += 1
+                    else:
+                        self.stats['errors'] += 1
+                    self._interval = min(self._max_interval, self._interval * 2)
+                    found = {}
+                events = []
+                with self._condition:
+                    for instance_id, details in found.items():
+                        previous = self._latest.get(instance_id)
+                        change = None
+                        if previous is None or previous['State'] != details['State']:
+                            change = 'state'
+                        elif details['Public IP'] and not previous['Public IP']:
+                            change = 'public_ip'
+                        if change:
+                            event = dict(details)
+                            event['Change'] = change
+                            event['Previous State'] = previous['State'] if previous else None
+                            events.append(event)
+                        self._latest[instance_id] = details
+                        if details['State'] == 'terminated':
+                            self._watched.discard(instance_id)
+                    self.stats['events'] += len(events)
+                    subscribers = list(self._subscribers)
+                    self._condition.notify_all()
+                for event in events:
+                    for callback in subscribers:
+                        try:
+                            callback(event)
+                        except Exception:
+                            pass
+                if events:
+                    self._interval = self._min_interval
+                else:
+                    self._interval = min(self._max_interval, self._interval * 1.5)
+                self._wake.wait(self._interval)
+                self._wake.clear()
+        finally:
+            with self._condition:
+                if self._thread is threading.current_thread():
+                    self._thread = None
+
+_trackers = {}
+_trackers_lock = threading.Lock()
+
+def get_instance_tracker(aws_access_key_id, aws_secret_access_key, region):
+    key = (_credentials_fingerprint(aws_access_key_id, aws_secret_access_key), region)
+    with _trackers_lock:
+        tracker = _trackers.get(key)
+        if tracker is None:
+            tracker = _trackers[key] = InstanceStateTracker(aws_access_key_id, aws_secret_access_key, region)
+    return tracker
+
+def _build_instance_args(
+    instance_type,
+    ami_id,
+    key_name,
+    security_group_ids=None,
+    subnet_id=None,
+    iam_instance_profile=None,
+    user_data=None,
+    volume_size=8,
+    volume_type='gp2',
+    tags=None,
+    min_count=1,
+    max_count=1
+):
+    instance_args = {
+        'ImageId': ami_id,
+        'MinCount': min_count,
+        'MaxCount': max_count,
+        'InstanceType': instance_type,
+        'KeyName': key_name,
+        'BlockDeviceMappings': [{
+            'DeviceName': ROOT_DEVICE_NAME,
+            'Ebs': {
+                'VolumeSize': volume_size,
+                'VolumeType': volume_type,
+                'DeleteOnTermination': True
+            }
+        }],
+    }
+    if security_group_ids:
+        instance_args['SecurityGroupIds'] = security_group_ids
+    if subnet_id:
+        instance_args['SubnetId'] = subnet_id
+    if iam_instance_profile:
+        instance_args['IamInstanceProfile'] = {'Name': iam_instance_profile}
+    if user_data:
+        instance_args['UserData'] = user_data
+    if tags:
+        instance_args['TagSpecifications'] = [{
+            'ResourceType': 'instance',
+            'Tags': tags
+        }]
+    return instance_args
+
+ROOT_VOLUME_TYPES = ('gp2', 'gp3', 'io1', 'io2', 'standard')
+PROVISIONED_IOPS_VOLUME_TYPES = ('io1', 'io2')
+MAX_VOLUME_SIZES = {'standard': 1024}
+MAX_VOLUME_SIZE = 16384
+MAX_USER_DATA_BYTES = 16384
+INSTANCE_TYPE_TTL = 86400
+PREFLIGHT_TTL = 3600
+PREFLIGHT_FAILURE_TTL = 60
+PREFLIGHT_TIMEOUT = 20
+MAX_PREFLIGHT_VERDICTS = 256
+
+_preflight_lock = threading.Lock()
+_preflight_verdicts = OrderedDict()
+_preflight_stats = {'hits': 0, 'misses': 0}
+
+def _image_info(aws_access_key_id, aws_secret_access_key, region, ami_id):
+    def load():
+        ec2_client = get_ec2_client(aws_access_key_id, aws_secret_access_key, region)
+        try:
+            images = ec2_client.describe_images(ImageIds=[ami_id])['Images']
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code', '').startswith('InvalidAMIID'):
+                return None
+            raise
+        if not images:
+            return None
+        image = images[0]
+        root = next(
+            (m for m in image.get('BlockDeviceMappings', []) if m.get('DeviceName') == image.get('RootDeviceName')), {}
+        )
+        return {
+            'Architecture': image.get('Architecture'),
+            'State': image.get('State'),
+            'RootDeviceName': image.get('RootDeviceName'),
+            'RootVolumeSize': root.get('Ebs', {}).get('VolumeSize'),
+        }
+    return _cached_lookup(f'image:{ami_id}', aws_access_key_id, aws_secret_access_key, region, load, ttl=AMI_CATALOG_TTL)
+
+def _instance_type_info(aws_access_key_id, aws_secret_access_key, region, instance_type):
+    def load():
+        ec2_client = get_ec2_client(aws_access_key_id, aws_secret_access_key, region)
+        try:
+            types = ec2_client.describe_instance_types(InstanceTypes=[instance_type])['InstanceTypes']
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'InvalidInstanceType':
+                return None
+            raise
+        if not types:
+            return None
+        return {'Architectures': types[0].get('ProcessorInfo', {}).get('SupportedArchitectures', [])}
+    return _cached_lookup(
+        f'instance_type:{instance_type}', aws_access_key_id, aws_secret_access_key, region, load, ttl=INSTANCE_TYPE_TTL
+    )
+
+def _instance_profile_exists(aws_access_key_id, aws_secret_access_key, region, name):
+    def load():
+        iam = get_iam_client(aws_access_key_id, aws_secret_access_key, region)
+        try:
+            iam.get_instance_profile(InstanceProfileName=name)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'NoSuchEntity':
+                return False
+            raise
+        return True
+    return _cached_lookup(f'instance_profile:{name}', aws_access_key_id, aws_secret_access_key, None, load)
+
+def _key_pair_exists(aws_access_key_id, aws_secret_access_key, region, key_name):
+    # Cached inventory answers most checks; a miss re-reads it once before failing
+    if key_name in get_key_pairs(aws_access_key_id, aws_secret_access_key, region):
+        return True
+    invalidate_cache('key_pairs', aws_access_key_id, aws_secret_access_key, region)
+    return key_name in get_key_pairs(aws_access_key_id, aws_secret_access_key, region)
+
+def _network_records(aws_access_key_id, aws_secret_access_key, region, group_ids, subnet_id):
+    def lookup():
+        groups, subnet = {}, None
+        if group_ids:
+            sg_index = get_security_group_index(aws_access_key_id, aws_secret_access_key, region)
+            groups = {group_id: sg_index.get(group_id) for group_id in group_ids}
+        if subnet_id:
+            subnet = get_subnet_index(aws_access_key_id, aws_secret_access_key, region).get(subnet_id)
+        return groups, subnet
+    groups, subnet = lookup()
+    if None in groups.values() or (subnet_id and subnet is None):
+        invalidate_cache('security_groups', aws_access_key_id, aws_secret_access_key, region)
+        invalidate_cache('subnets', aws_access_key_id, aws_secret_access_key, region)
+        groups, subnet = lookup()
+    return groups, subnet
+
+def _dry_run(aws_access_key_id, aws_secret_access_key, region, instance_args):
     ec2_client = get_ec2_client(aws_access_key_id, aws_secret_access_key, region)
-    response = ec2_client.describe_subnets()
-    return [{'SubnetId': sn['SubnetId'], 'CidrBlock': sn['CidrBlock']} for sn in response['Subnets']]
-
-def get_iam_roles(aws_access_key_id, aws_secret_access_key, region):
-    iam_client = get_iam_client(aws_access_key_id, aws_secret_access_key, region)
-    paginator = iam_client.get_paginator('list_roles')
-    roles = []
-    for page in paginator.paginate():
-        for role in page['Roles']:
-            roles.append(role['RoleName'])
-    return roles
+    try:
+        ec2_client.run_instances(DryRun=True, **instance_args)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') == 'DryRunOperation':
+            return None
+        return e.response.get('Error', {}).get('Message') or str(e)
+    return None
 
-def launch_instance(
+def _local_findings(volume_size, volume_type, user_data, tags):
+    errors = []
+    if volume_type not in ROOT_VOLUME_TYPES:
+        errors.append(f"{volume_type} volumes cannot be used as a root volume")
+    elif volume_type in PROVISIONED_IOPS_VOLUME_TYPES:
+        errors.append(f"{volume_type} volumes need provisioned IOPS, which this launcher does not set")
+    if not 1 <= volume_size <= MAX_VOLUME_SIZES.get(volume_type, MAX_VOLUME_SIZE):
+        errors.append(f"Root volume size {volume_size} GiB is out of range for {volume_type}")
+    if user_data and len(user_data.encode()) > MAX_USER_DATA_BYTES:
+        errors.append(f"User data is {len(user_data.encode())} bytes; the limit is {MAX_USER_DATA_BYTES}")
+    for tag in tags or []:
+        if tag['Key'].lower().startswith('aws:'):
+            errors.append(f"Tag key {tag['Key']} uses the reserved aws: prefix")
+    return errors
+
+def _run_preflight(aws_access_key_id, aws_secret_access_key, region, instance_args, params):
+    credentials = (aws_access_key_id, aws_secret_access_key)
+    calls = {
+        'dry_run': lambda: _dry_run(*credentials, region, instance_args),
+        'image': lambda: _image_info(*credentials, region, params['ami_id']),
+        'instance_type': lambda: _instance_type_info(*credentials, region, params['instance_type']),
+        'key_pair': lambda: _key_pair_exists(*credentials, region, params['key_name']),
+    }
+    if params['security_group_ids'] or params['subnet_id']:
+        calls['network'] = lambda: _network_records(
+            *credentials, region, params['security_group_ids'], params['subnet_id']
+        )
+    if params['iam_instance_profile']:
+        calls['iam_profile'] = lambda: _instance_profile_exists(*credentials, region, params['iam_instance_profile'])
+    values, warnings, skipped = {}, [], []
+    for name, value, error in iter_parallel(submit_parallel(calls, PRIORITY_URGENT, _preflight_executor), PREFLIGHT_TIMEOUT):
+        if error is None:
+            values[name] = value
+        else:
+            # A check that cannot run (permissions, timeout) warns instead of blocking the launch
+            skipped.append(name)
+            warnings.append(f"Could not run the {name.replace('_', ' ')} check: {error}")
+
+    errors = _local_findings(params['volume_size'], params['volume_type'], params['user_data'], params['tags'])
+    if values.get('dry_run'):
+        errors.append(f"Dry run rejected the launch: {values['dry_run']}")
+    if values.get('key_pair') is False:
+        errors.append(f"Key pair {params['key_name']} does not exist in {region}")
+    image, instance_type = values.get('image'), values.get('instance_type')
+    if 'image' in values and image is None:
+        errors.append(f"AMI {params['ami_id']} was not found in {region}")
+    if 'instance_type' in values and instance_type is None:
+        errors.append(f"Instance type {params['instance_type']} is not offered in {region}")
+    if image:
+        if image['State'] != 'available':
+            errors.append(f"AMI {params['ami_id']} is {image['State']}, not available")
+        if instance_type and image['Architecture'] not in instance_type['Architectures']:
+            errors.append(
+                f"AMI {params['ami_id']} is {image['Architecture']} but {params['instance_type']} "
+                f"supports {', '.join(instance_type['Architectures'])}"
+            )
+        if image['RootDeviceName'] != ROOT_DEVICE_NAME:
+            warnings.append(
+                f"AMI root device is {image['RootDeviceName']}, not {ROOT_DEVICE_NAME}: the volume settings "
+                f"will add a second disk instead of resizing the root disk"
+            )
+        elif image['RootVolumeSize'] and params['volume_size'] < image['RootVolumeSize']:
+            errors.append(f"Root volume must be at least {image['RootVolumeSize']} GiB for this AMI")
+    if 'network' in values:
+        groups, subnet = values['network']
+        if params['subnet_id'] and subnet is None:
+            errors.append(f"Subnet {params['subnet_id']} does not exist in {region}")
+        for group_id, group in groups.items():
+            if group is None:
+                errors.append(f"Security group {group_id} does not exist in {region}")
+            elif subnet and group.vpc_id != subnet.vpc_id:
+                errors.append(f"Security group {group_id} is in {group.vpc_id} but subnet {subnet.id} is in {subnet.vpc_id}")
+    if values.get('iam_profile') is False:
+        errors.append(f"No instance profile named {params['iam_instance_profile']}; attach the role to an instance profile first")
+    return {'OK': not errors, 'Errors': errors, 'Warnings': warnings, 'Checks': sorted(calls), 'Skipped': sorted(skipped)}
+
+def preflight_launch(
     aws_access_key_id,
     aws_secret_access_key,
     region,
@@ -130,56 +1055,376 @@ def launch_instance(
     user_data=None,
     volume_size=8,
     volume_type='gp2',
-    tags=None
+    tags=None,
+    force=False
 ):
-    ec2 = boto3.resource(
-        'ec2',
-        aws_access_key_id=aws_access_key_id,
-        aws_secret_access_key=aws_secret_access_key,
-        region_name=region
+    params = {
+        'instance_type': instance_type, 'ami_id': ami_id, 'key_name': key_name,
+        'security_group_ids': sorted(security_group_ids or []) or None, 'subnet_id': subnet_id,
+        'iam_instance_profile': iam_instance_profile, 'user_data': user_data,
+        'volume_size': int(volume_size), 'volume_type': volume_type, 'tags': tags,
+    }
+    key = (
+        _credentials_fingerprint(aws_access_key_id, aws_secret_access_key), region,
+        hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    )
+    with _preflight_lock:
+        entry = _preflight_verdicts.get(key)
+        if entry is not None and entry[0] > time.monotonic() and not force:
+            _preflight_verdicts.move_to_end(key)
+            _preflight_stats['hits'] += 1
+            return dict(entry[1], Cached=True)
+        _preflight_stats['misses'] += 1
+    instance_args = _build_instance_args(
+        instance_type, ami_id, key_name, security_group_ids, subnet_id,
+        iam_instance_profile, user_data, int(volume_size), volume_type, tags
     )
+    with metrics.timed('preflight_seconds'):
+        verdict = _run_preflight(aws_access_key_id, aws_secret_access_key, region, instance_args, params)
+    metrics.inc('preflight_verdicts_total', outcome='ok' if verdict['OK'] else 'failed')
+    # Known-good profiles are trusted for longer; failures are re-checked soon since users fix them,
+    # and so is a pass where some checks never ran
+    ttl = PREFLIGHT_TTL if verdict['OK'] and not verdict['Skipped'] else PREFLIGHT_FAILURE_TTL
+    with _preflight_lock:
+        _preflight_verdicts[key] = (time.monotonic() + ttl, verdict)
+        _preflight_verdicts.move_to_end(key)
+        while len(_preflight_verdicts) > MAX_PREFLIGHT_VERDICTS:
+            _preflight_verdicts.popitem(last=False)
+    return dict(verdict, Cached=False)
+
+def clear_preflight_cache():
+    with _preflight_lock:
+        _preflight_verdicts.clear()
+
+def get_preflight_stats():
+    with _preflight_lock:
+        return dict(_preflight_stats, size=len(_preflight_verdicts))
+
+def _preflight_error(verdict):
+    return "Preflight failed: " + "; ".join(verdict['Errors'])
+
+def launch_instance(
+    aws_access_key_id,
+    aws_secret_access_key,
+    region,
+    instance_type,
+    ami_id,
+    key_name,
+    security_group_ids=None,
+    subnet_id=None,
+    iam_instance_profile=None,
+    user_data=None,
+    volume_size=8,
+    volume_type='gp2',
+    tags=None,
+    warm_pool=False,
+    preflight=True
+):
+    started = time.perf_counter()
+    ec2 = get_ec2_resource(aws_access_key_id, aws_secret_access_key, region)
     try:
-        instance_args = {
-            'ImageId': ami_id,
-            'MinCount': 1,
-            'MaxCount': 1,
-            'InstanceType': instance_type,
-            'KeyName': key_name,
-            'BlockDeviceMappings': [{
-                'DeviceName': '/dev/xvda',
-                'Ebs': {
-                    'VolumeSize': volume_size,
-                    'VolumeType': volume_type,
-                    'DeleteOnTermination': True
-                }
-            }],
-        }
-        if security_group_ids:
-            instance_args['SecurityGroupIds'] = security_group_ids
-        if subnet_id:
-            instance_args['SubnetId'] = subnet_id
-        if iam_instance_profile:
-            instance_args['IamInstanceProfile'] = {'Name': iam_instance_profile}
-        if user_data:
-            instance_args['UserData'] = user_data
-        if tags:
-            instance_args['TagSpecifications'] = [{
-                'ResourceType': 'instance',
-                'Tags': tags
-            }]
-        instance = ec2.create_instances(**instance_args)[0]
-        instance.wait_until_running()
-        instance.reload()
-        return {
-            'Instance ID': instance.id,
-            'State': instance.state['Name'],
-            'Type': instance.instance_type,
-            'Public IP': instance.public_ip_address,
-            'AMI': instance.image_id
-        }
+        if preflight:
+            verdict = preflight_launch(
+                aws_access_key_id, aws_secret_access_key, region, instance_type, ami_id, key_name,
+                security_group_ids, subnet_id, iam_instance_profile, user_data, volume_size, volume_type, tags
+            )
+            if not verdict['OK']:
+                return {"Error": _preflight_error(verdict), "Code": "PreflightFailed", "Preflight": verdict}
+        # See warm_profile_id for why user data always launches cold
+        use_pool = warm_pool and not user_data
+        pool = get_warm_pool(aws_access_key_id, aws_secret_access_key, region) if use_pool else None
+        claimed, warnings = [], []
+        if pool:
+            profile_id = warm_profile_id(instance_type, ami_id, key_name, subnet_id, volume_size, volume_type)
+            claimed, warnings = pool.claim(profile_id, 1, security_group_ids, iam_instance_profile, tags)
+        if claimed:
+            instance_id = claimed[0]['Instance ID']
+        else:
+            instance_args = _build_instance_args(
+                instance_type, ami_id, key_name, security_group_ids, subnet_id,
+                iam_instance_profile, user_data, volume_size, volume_type, tags
+            )
+            instance_id = ec2.create_instances(**instance_args)[0].id
+        tracker = get_instance_tracker(aws_access_key_id, aws_secret_access_key, region)
+        with metrics.timed('launch_wait_seconds', mode='single'):
+            details = tracker.wait_for([instance_id])[instance_id]
+        if details is None:
+            return {"Error": f"Timed out waiting for {instance_id} to start running"}
+        if details['State'] != 'running':
+            return {"Error": f"Instance {instance_id} entered state {details['State']} instead of running"}
+        if pool:
+            path = 'warm' if claimed else 'cold'
+            pool.record_latency(path, time.perf_counter() - started)
+            details = dict(details, **{'Launch Path': path})
+            if warnings:
+                details['Warnings'] = warnings
+        return details
+    except ClientError as e:
+        code = e.response.get('Error', {}).get('Code')
+        if code in THROTTLE_ERROR_CODES:
+            return {"Error": f"AWS is throttling requests ({code}); retried {RETRY_MAX_ATTEMPTS - 1} times, try again shortly", "Code": code}
+        return {"Error": str(e), "Code": code}
     except Exception as e:
         return {"Error": str(e)}
 
+def _group_launch_specs(specs):
+    # Specs that differ only in count can share one RunInstances call
+    batches = OrderedDict()
+    for index, spec in enumerate(specs):
+        spec = dict(spec)
+        count = int(spec.pop('count', 1))
+        key = json.dumps(spec, sort_keys=True, default=str)
+        if key not in batches:
+            batches[key] = {'spec': spec, 'count': 0, 'specs': []}
+        batches[key]['count'] += count
+        batches[key]['specs'].append(index)
+    return list(batches.values())
+
+def launch_instances(
+    aws_access_key_id,
+    aws_secret_access_key,
+    region,
+    specs=None,
+    count=1,
+    max_workers=LAUNCH_WORKERS,
+    wait=True,
+    preflight=True,
+    **launch_args
+):
+    if specs is None:
+        specs = [dict(launch_args, count=count)]
+    batches = _group_launch_specs(specs)
+    requested = sum(batch['count'] for batch in batches)
+    ec2_client = get_ec2_client(aws_access_key_id, aws_secret_access_key, region)
+
+    def run_batch(batch):
+        if preflight:
+            verdict = preflight_launch(aws_access_key_id, aws_secret_access_key, region, **batch['spec'])
+            if not verdict['OK']:
+                raise ValueError(_preflight_error(verdict))
+        instance_args = _build_instance_args(min_count=1, max_count=batch['count'], **batch['spec'])
+        response = ec2_client.run_instances(**instance_args)
+        # The response already carries the details; DescribeInstances right after a launch
+        # can still answer InvalidInstanceID.NotFound and lose track of instances that exist
+        return [_instance_details(instance) for instance in response['Instances']]
+
+    launched_details, failures = [], []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as executor:
+        run_batch = _with_priority(run_batch, _current_priority())
+        futures = {executor.submit(run_batch, batch): batch for batch in batches}
+        for future in as_completed(futures):
+            batch = futures[future]
+            try:
+                launched = future.result()
+            except Exception as e:
+                failures.append({'Specs': batch['specs'], 'Requested': batch['count'], 'Error': str(e)})
+                continue
+            launched_details.extend(launched)
+            if len(launched) < batch['count']:
+                failures.append({
+                    'Specs': batch['specs'],
+                    'Requested': batch['count'],
+                    'Error': f"Only {len(launched)} of {batch['count']} instances launched"
+                })
+
+    instance_ids = [details['Instance ID'] for details in launched_details]
+    failed = requested - len(instance_ids)
+    if wait and instance_ids:
+        tracker = get_instance_tracker(aws_access_key_id, aws_secret_access_key, region)
+        with metrics.timed('launch_wait_seconds', mode='fleet'):
+            settled = tracker.wait_for(instance_ids)
+        instances = [details for details in settled.values() if details is not None]
+        timed_out = [instance_id for instance_id, details in settled.items() if details is None]
+        if timed_out:
+            failures.append({'Instances': timed_out, 'Error': 'Timed out waiting for instances to start running'})
+        # Capacity or EBS errors surface as instances that settle stopped or terminated
+        ended = {}
+        for details in instances:
+            if details['State'] != 'running':
+                ended.setdefault(details['State'], []).append(details['Instance ID'])
+        for state, ended_ids in sorted(ended.items()):
+            failures.append({'Instances': ended_ids, 'Error': f"Instances entered state {state} instead of running"})
+        failed += len(timed_out) + sum(len(ended_ids) for ended_ids in ended.values())
+    else:
+        instances = launched_details
+    return {
+        'Instances': instances,
+        'Failures': failures,
+        'Summary': {
+            'Requested': requested,
+            'Launched': len(instance_ids),
+            'Running': sum(1 for instance in instances if instance['State'] == 'running'),
+            'Failed': failed
+        }
+    }
+
+JOB_WORKERS = 4
+MAX_LAUNCH_JOBS = 500
+JOB_DONE_STATUSES = ('running', 'partial', 'failed', 'timed out')
+
+_job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='ec2-launch')
+_jobs_lock = threading.Lock()
+_launch_jobs = OrderedDict()
+_job_by_instance = {}
+_subscribed_trackers = set()
+
+def _settle_job(job):
+    states = [details['State'] if details else None for details in job['Instances'].values()]
+    if any(state is None or state == 'pending' for state in states):
+        return
+    running = sum(1 for state in states if state == 'running')
+    if running == job['Requested']:
+        job['Status'] = 'running'
+    else:
+        job['Status'] = 'partial' if running else 'failed'
+    job['Finished'] = time.time()
+
+def _on_instance_event(event):
+    with _jobs_lock:
+        job = _launch_jobs.get(_job_by_instance.get(event['Instance ID']))
+        if job is None:
+            return
+        if job['Status'] in JOB_DONE_STATUSES:
+            finished, tracker, pool = list(job['Instances']), job['_tracker'], None
+        else:
+            details = dict(event)
+            details.pop('Change', None)
+            details.pop('Previous State', None)
+            job['Instances'][event['Instance ID']] = details
+            _settle_job(job)
+            finished = list(job['Instances']) if job['Status'] in JOB_DONE_STATUSES else None
+            tracker = job['_tracker']
+            pool = job.get('_pool')
+            path = 'warm' if event['Instance ID'] in job.get('_warm_ids', ()) else 'cold'
+            became_running = event['Change'] == 'state' and event['State'] == 'running'
+            submitted = job['Submitted']
+    if pool and became_running:
+        pool.record_latency(path, time.time() - submitted)
+    if finished:
+        tracker.unwatch(finished)
+
+def _claim_warm_instances(aws_access_key_id, aws_secret_access_key, region, pool, specs):
+    # Claims what the pool can cover and returns the specs that still need a cold launch
+    claimed, warnings, remaining = [], [], []
+    for spec in specs:
+        spec = dict(spec)
+        count = int(spec.pop('count', 1))
+        # Invalid specs stay on the cold path, where launch_instances reports the preflight failure;
+        # so do specs with user data (see warm_profile_id)
+        if spec.get('user_data') or not preflight_launch(aws_access_key_id, aws_secret_access_key, region, **spec)['OK']:
+            remaining.append(dict(spec, count=count))
+            continue
+        profile_id = warm_profile_id(
+            spec['instance_type'], spec['ami_id'], spec['key_name'], spec.get('subnet_id'),
+            spec.get('volume_size', 8), spec.get('volume_type', 'gp2')
+        )
+        instances, errors = pool.claim(
+            profile_id, count, spec.get('security_group_ids'), spec.get('iam_instance_profile'), spec.get('tags')
+        )
+        claimed.extend(instances)
+        warnings.extend(errors)
+        if count > len(instances):
+            remaining.append(dict(spec, count=count - len(instances)))
+    return claimed, warnings, remaining
+
+def _run_launch_job(job_id, aws_access_key_id, aws_secret_access_key, region, specs, warm_pool=False):
+    with _jobs_lock:
+        job = _launch_jobs[job_id]
+        job['Status'] = 'launching'
+    pool = get_warm_pool(aws_access_key_id, aws_secret_access_key, region) if warm_pool else None
+    claimed, warnings = [], []
+    if pool:
+        claimed, warnings, specs = _claim_warm_instances(
+            aws_access_key_id, aws_secret_access_key, region, pool, specs
+        )
+    if specs:
+        result = launch_instances(aws_access_key_id, aws_secret_access_key, region, specs=specs, wait=False)
+    else:
+        result = {'Instances': [], 'Failures': []}
+    tracker = get_instance_tracker(aws_access_key_id, aws_secret_access_key, region)
+    with _jobs_lock:
+        job['Failures'] = result['Failures'] + [{'Error': warning} for warning in warnings]
+        job['Instances'] = {details['Instance ID']: details for details in claimed + result['Instances']}
+        job['Warm'] = len(claimed)
+        job['_pool'] = pool
+        job['_warm_ids'] = {details['Instance ID'] for details in claimed}
+        job['_tracker'] = tracker
+        if _launch_jobs.get(job_id) is not job or job['Status'] in JOB_DONE_STATUSES:
+            # Evicted or timed out while launching; nothing will poll for this job
+            return
+        if not job['Instances']:
+            job['Status'] = 'failed'
+            job['Finished'] = time.time()
+            return
+        job['Status'] = 'pending'
+        for instance_id in job['Instances']:
+            _job_by_instance[instance_id] = job_id
+        if id(tracker) not in _subscribed_trackers:
+            _subscribed_trackers.add(id(tracker))
+            tracker.subscribe(_on_instance_event)
+    # No thread waits here: the tracker's poller advances the job through _on_instance_event
+    tracker.watch(list(job['Instances']))
+
+def _public_job(job):
+    view = {key: value for key, value in job.items() if not key.startswith('_')}
+    view['Instances'] = [details for details in job['Instances'].values() if details]
+    view['Failures'] = list(job['Failures'])
+    return view
+
+def submit_launch_job(aws_access_key_id, aws_secret_access_key, region, specs=None, count=1, warm_pool=False, **launch_args):
+    if specs is None:
+        specs = [dict(launch_args, count=count)]
+    job_id = uuid.uuid4().hex[:12]
+    job = {
+        'Job ID': job_id,
+        'Region': region,
+        'Status': 'queued',
+        'Requested': sum(int(spec.get('count', 1)) for spec in specs),
+        'Instances': {},
+        'Failures': [],
+        'Warm': 0,
+        'Submitted': time.time(),
+        'Finished': None,
+    }
+    evicted = []
+    with _jobs_lock:
+        _launch_jobs[job_id] = job
+        while len(_launch_jobs) > MAX_LAUNCH_JOBS:
+            _, old_job = _launch_jobs.popitem(last=False)
+            for instance_id in old_job['Instances']:
+                _job_by_instance.pop(instance_id, None)
+            if old_job.get('_tracker') is not None:
+                evicted.append((old_job['_tracker'], list(old_job['Instances'])))
+    for tracker, instance_ids in evicted:
+        tracker.unwatch(instance_ids)
+    def run():
+        try:
+            _run_launch_job(job_id, aws_access_key_id, aws_secret_access_key, region, specs, warm_pool)
+        except Exception as e:
+            with _jobs_lock:
+                job['Status'] = 'failed'
+                job['Failures'].append({'Error': str(e)})
+                job['Finished'] = time.time()
+    _job_executor.submit(_with_priority(run, _current_priority()))
+    return job_id
+
+def get_launch_job(job_id):
+    timed_out = None
+    with _jobs_lock:
+        job = _launch_jobs.get(job_id)
+        if job is None:
+            return None
+        if job['Status'] not in JOB_DONE_STATUSES and time.time() - job['Submitted'] > TRACKER_WAIT_TIMEOUT:
+            job['Status'] = 'timed out'
+            job['Finished'] = time.time()
+            if job.get('_tracker') is not None:
+                timed_out = (job['_tracker'], list(job['Instances']))
+        view = _public_job(job)
+    if timed_out:
+        tracker, instance_ids = timed_out
+        tracker.unwatch(instance_ids)
+    return view
+
 def stop_instance(aws_access_key_id, aws_secret_access_key, region, instance_id):
     ec2 = get_ec2_client(aws_access_key_id, aws_secret_access_key, region)
     ec2.stop_instances(InstanceIds=[instance_id])
@@ -189,3 +1434,480 @@ def terminate_instance(aws_access_key_id, aws_secret_access_key, region, instanc
     ec2 = get_ec2_client(aws_access_key_id, aws_secret_access_key, region)
     ec2.terminate_instances(InstanceIds=[instance_id])
     return True
+
+BULK_ACTION_CHUNK_SIZE = 1000
+BULK_ACTION_WORKERS = 4
+BULK_ACTION_CALLS_PER_SECOND = 5
+BULK_ACTIONS = {
+    'stop': ('stop_instances', 'StoppingInstances', 'stopped', ('terminated',)),
+    'start': ('start_instances', 'StartingInstances', 'running', ('terminated',)),
+    'terminate': ('terminate_instances', 'TerminatingInstances', 'terminated', ()),
+}
+# Errors where one ineligible instance rejects the whole call; anything else fails every ID in the chunk
+BULK_BISECT_ERROR_PREFIXES = ('InvalidInstanceID', 'IncorrectInstanceState', 'UnsupportedOperation')
+
+def find_instances_by_tags(aws_access_key_id, aws_secret_access_key, region, tags):
+    ec2_client = get_ec2_client(aws_access_key_id, aws_secret_access_key, region)
+    filters = _inventory_filters(tags=tags)
+    filters.append({'Name': 'instance-state-name', 'Values': ['pending', 'running', 'stopping', 'stopped']})
+    pages = ec2_client.get_paginator('describe_instances').paginate(Filters=filters)
+    return list(pages.search('Reservations[].Instances[].InstanceId'))
+
+def bulk_instance_action(
+    aws_access_key_id,
+    aws_secret_access_key,
+    region,
+    action,
+    instance_ids=None,
+    tags=None,
+    wait=False,
+    max_workers=BULK_ACTION_WORKERS,
+    calls_per_second=BULK_ACTION_CALLS_PER_SECOND
+):
+    if action not in BULK_ACTIONS:
+        raise ValueError(f"Unknown bulk action: {action}")
+    operation, result_key, target_state, failed_states = BULK_ACTIONS[action]
+    regions = [region] if isinstance(region, str) else list(region)
+    if isinstance(instance_ids, dict):
+        targets = {r: list(ids) for r, ids in instance_ids.items()}
+    else:
+        targets = {r: [] for r in regions}
+        if instance_ids:
+            targets[regions[0]] = list(instance_ids)
+    if tags:
+        for r in regions:
+            targets.setdefault(r, []).extend(find_instances_by_tags(aws_access_key_id, aws_secret_access_key, r, tags))
+    targets = {r: list(dict.fromkeys(ids)) for r, ids in targets.items() if ids}
+
+    slot_lock = threading.Lock()
+    next_slot = [time.monotonic()]
+    def take_slot():
+        with slot_lock:
+            delay = next_slot[0] - time.monotonic()
+            next_slot[0] = max(next_slot[0], time.monotonic()) + 1.0 / calls_per_second
+        if delay > 0:
+            time.sleep(delay)
+
+    def run_chunk(chunk_region, chunk):
+        ec2_client = get_ec2_client(aws_access_key_id, aws_secret_access_key, chunk_region)
+        take_slot()
+        try:
+            response = getattr(ec2_client, operation)(InstanceIds=chunk)
+        except ClientError as e:
+            # One unknown or ineligible ID rejects the whole call, so bisect to isolate it
+            if len(chunk) > 1 and e.response.get('Error', {}).get('Code', '').startswith(BULK_BISECT_ERROR_PREFIXES):
+                middle = len(chunk) // 2
+                return run_chunk(chunk_region, chunk[:middle]) + run_chunk(chunk_region, chunk[middle:])
+            return [
+                {'Instance ID': instance_id, 'Region': chunk_region, 'Previous State': None,
+                 'Current State': None, 'Error': str(e)}
+                for instance_id in chunk
+            ]
+        return [
+            {'Instance ID': change['InstanceId'], 'Region': chunk_region,
+             'Previous State': change['PreviousState']['Name'],
+             'Current State': change['CurrentState']['Name'], 'Error': None}
+            for change in response[result_key]
+        ]
+
+    results = []
+    jobs = [(r, chunk) for r, ids in targets.items() for chunk in _chunks(ids, BULK_ACTION_CHUNK_SIZE)]
+    if jobs:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs)))) as executor:
+            for chunk_results in executor.map(_with_priority(lambda job: run_chunk(*job), _current_priority()), jobs):
+                results.extend(chunk_results)
+
+    if wait:
+        by_region = {}
+        for result in results:
+            if result['Error'] is None:
+                by_region.setdefault(result['Region'], []).append(result)
+        for wait_region, region_results in by_region.items():
+            tracker = get_instance_tracker(aws_access_key_id, aws_secret_access_key, wait_region)
+            settled = tracker.wait_for(
+                [result['Instance ID'] for result in region_results],
+                states=(target_state,), failed_states=failed_states
+            )
+            for result in region_results:
+                details = settled.get(result['Instance ID'])
+                if details is None:
+                    result['Error'] = f"Timed out waiting for {target_state}"
+                else:
+                    result['Current State'] = details['State']
+                    if details['State'] != target_state:
+                        result['Error'] = f"Ended in {details['State']} instead of {target_state}"
+
+    return {
+        'Results': results,
+        'Summary': {
+            'Action': action,
+            'Requested': sum(len(ids) for ids in targets.values()),
+            'Succeeded': sum(1 for result in results if result['Error'] is None),
+            'Failed': sum(1 for result in results if result['Error'] is not None),
+            'Regions': sorted(targets),
+        }
+    }
+
+def stop_instances(aws_access_key_id, aws_secret_access_key, region, instance_ids=None, tags=None, wait=False):
+    return bulk_instance_action(aws_access_key_id, aws_secret_access_key, region, 'stop', instance_ids, tags, wait)
+
+def start_instances(aws_access_key_id, aws_secret_access_key, region, instance_ids=None, tags=None, wait=False):
+    return bulk_instance_action(aws_access_key_id, aws_secret_access_key, region, 'start', instance_ids, tags, wait)
+
+def terminate_instances(aws_access_key_id, aws_secret_access_key, region, instance_ids=None, tags=None, wait=False):
+    return bulk_instance_action(aws_access_key_id, aws_secret_access_key, region, 'terminate', instance_ids, tags, wait)
+
+WARM_POOL_TAG = 'ec2-launcher:warm-pool'
+WARM_POOL_NAME = 'ec2-launcher-warm-pool'
+WARM_POOL_REPLENISH_INTERVAL = 30
+WARM_POOL_MAX_SIZE = 50
+WARM_POOL_LATENCY_SAMPLES = 500
+WARM_POOL_LIVE_STATES = ('pending', 'running', 'stopping', 'stopped')
+WARM_POOL_STATS_MAX_AGE = 30
+WARM_POOL_UNTAG_ATTEMPTS = 3
+WARM_POOL_UNTAG_BACKOFF = 0.5
+
+def warm_profile_id(instance_type, ami_id, key_name, subnet_id=None, volume_size=8, volume_type='gp2'):
+    # Only settings that cannot change across a stop/start belong to the profile;
+    # security groups, IAM profile and tags are applied when an instance is claimed.
+    # Launches with user data are never pooled: it would run at build time, not at claim time.
+    raw = json.dumps([ami_id, instance_type, subnet_id, key_name, int(volume_size), volume_type])
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+class WarmPool:
+    # Pool membership lives in an instance tag, so pools survive restarts and are
+    # shared by every process using the same account. StartInstances reports the
+    # previous state, which makes it the claim: only the caller that saw "stopped" wins.
+
+    def __init__(self, aws_access_key_id, aws_secret_access_key, region):
+        self.region = region
+        self._credentials = (aws_access_key_id, aws_secret_access_key)
+        self._ec2_client = get_ec2_client(aws_access_key_id, aws_secret_access_key, region)
+        self._lock = threading.Lock()
+        self._claim_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._targets = {}
+        self._members = {}
+        self._refreshed_at = None
+        self._seen_running = set()
+        self._thread = None
+        self._latency = {'warm': deque(maxlen=WARM_POOL_LATENCY_SAMPLES), 'cold': deque(maxlen=WARM_POOL_LATENCY_SAMPLES)}
+        self.stats = {'hits': 0, 'misses': 0, 'claim_conflicts': 0, 'built': 0, 'trimmed': 0, 'stranded': 0, 'errors': 0}
+
+    def configure(self, size, instance_type, ami_id, key_name, subnet_id=None, volume_size=8, volume_type='gp2'):
+        size = max(0, min(int(size), WARM_POOL_MAX_SIZE))
+        profile_id = warm_profile_id(instance_type, ami_id, key_name, subnet_id, volume_size, volume_type)
+        spec = {
+            'instance_type': instance_type, 'ami_id': ami_id, 'key_name': key_name, 'subnet_id': subnet_id,
+            'volume_size': int(volume_size), 'volume_type': volume_type,
+        }
+        with self._lock:
+            # Size 0 keeps the profile so the replenisher can trim what is left
+            self._targets[profile_id] = {'spec': spec, 'size': size}
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f'ec2-warm-pool-{self.region}', daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return profile_id
+
+    def drain(self):
+        # Terminates every pool instance in the region, including ones left by a previous
+        # process or configured elsewhere, and stops the replenisher using these credentials
+        with self._lock:
+            self._targets.clear()
+        with self._claim_lock:
+            members = self._refresh_members()
+            instance_ids = [d['Instance ID'] for live in members.values() for d in live]
+            if instance_ids:
+                result = terminate_instances(*self._credentials, self.region, instance_ids)
+                self.stats['trimmed'] += result['Summary']['Succeeded']
+                if result['Summary']['Failed']:
+                    self.stats['errors'] += 1
+        self._wake.set()
+        return len(instance_ids)
+
+    def _refresh_members(self):
+        # Every tagged instance counts, not only profiles configured in this process
+        with self._lock:
+            members = {profile_id: [] for profile_id in self._targets}
+        pages = self._ec2_client.get_paginator('describe_instances').paginate(Filters=[
+            {'Name': 'tag-key', 'Values': [WARM_POOL_TAG]},
+            {'Name': 'instance-state-name', 'Values': list(WARM_POOL_LIVE_STATES)},
+        ])
+        for page in pages:
+            for reservation in page['Reservations']:
+                for instance in reservation['Instances']:
+                    profile_id = next(t['Value'] for t in instance.get('Tags', []) if t['Key'] == WARM_POOL_TAG)
+                    members.setdefault(profile_id, []).append(_instance_details(instance))
+        with self._lock:
+            self._members = members
+            self._refreshed_at = time.monotonic()
+        return members
+
+    def claim(self, profile_id, count, security_group_ids=None, iam_instance_profile=None, tags=None):
+        with self._claim_lock:
+            with self._lock:
+                stopped = [d for d in self._members.get(profile_id, []) if d['State'] == 'stopped']
+            if len(stopped) < count:
+                stopped = [d for d in self._refresh_members().get(profile_id, []) if d['State'] == 'stopped']
+            candidates = {d['Instance ID']: d for d in stopped[:count]}
+            claimed, errors = [], []
+            if candidates:
+                try:
+                    response = self._ec2_client.start_instances(InstanceIds=list(candidates))
+                except ClientError as e:
+                    response = {'StartingInstances': []}
+                    errors.append(str(e))
+                for change in response['StartingInstances']:
+                    if change['PreviousState']['Name'] == 'stopped':
+                        claimed.append(dict(candidates[change['InstanceId']], State='pending'))
+                    else:
+                        self.stats['claim_conflicts'] += 1
+            if claimed:
+                # Only an instance without the pool tag is handed out; one that keeps it would be
+                # parked by replenish() as stranded, so it goes back to the pool instead
+                untag_error = self._untag([d['Instance ID'] for d in claimed])
+                if untag_error:
+                    errors.append(f"Could not take warm instances out of the pool: {untag_error}")
+                    stop_instances(*self._credentials, self.region, [d['Instance ID'] for d in claimed])
+                    claimed = []
+            with self._lock:
+                taken = {d['Instance ID'] for d in claimed} | set(candidates)
+                self._members[profile_id] = [d for d in self._members.get(profile_id, []) if d['Instance ID'] not in taken]
+                self.stats['hits'] += len(claimed)
+                self.stats['misses'] += count - len(claimed)
+        metrics.inc('warm_pool_claims_total', len(claimed), result='hit')
+        metrics.inc('warm_pool_claims_total', count - len(claimed), result='miss')
+        if claimed:
+            errors.extend(self._retag([d['Instance ID'] for d in claimed], security_group_ids, iam_instance_profile, tags))
+        self._wake.set()
+        return claimed, errors
+
+    def _untag(self, instance_ids):
+        error = None
+        for attempt in range(WARM_POOL_UNTAG_ATTEMPTS):
+            try:
+                self._ec2_client.delete_tags(
+                    Resources=instance_ids, Tags=[{'Key': WARM_POOL_TAG}, {'Key': 'Name', 'Value': WARM_POOL_NAME}]
+                )
+                return None
+            except Exception as e:
+                error = e
+                if attempt + 1 < WARM_POOL_UNTAG_ATTEMPTS:
+                    time.sleep(WARM_POOL_UNTAG_BACKOFF * (attempt + 1))
+        return str(error)
+
+    def _retag(self, instance_ids, security_group_ids, iam_instance_profile, tags):
+        errors = []
+        calls = []
+        if tags:
+            calls.append(lambda: self._ec2_client.create_tags(Resources=instance_ids, Tags=tags))
+        for instance_id in instance_ids:
+            if security_group_ids:
+                calls.append(lambda instance_id=instance_id: self._ec2_client.modify_instance_attribute(
+                    InstanceId=instance_id, Groups=security_group_ids
+                ))
+            if iam_instance_profile:
+                calls.append(lambda instance_id=instance_id: self._ec2_client.associate_iam_instance_profile(
+                    InstanceId=instance_id, IamInstanceProfile={'Name': iam_instance_profile}
+                ))
+        for call in calls:
+            try:
+                call()
+            except ClientError as e:
+                errors.append(str(e))
+        return errors
+
+    def record_latency(self, path, seconds):
+        with self._lock:
+            self._latency[path].append(seconds)
+        metrics.observe('launch_seconds', seconds, path=path)
+
+    def _build(self, profile_id, spec, count):
+        tags = [{'Key': 'Name', 'Value': WARM_POOL_NAME}, {'Key': WARM_POOL_TAG, 'Value': profile_id}]
+        result = launch_instances(*self._credentials, self.region, specs=[dict(spec, count=count, tags=tags)])
+        self.stats['built'] += len(result['Instances'])
+        with self._lock:
+            drained = profile_id not in self._targets
+        if drained:
+            # The pool was turned off while these were booting
+            built = [d['Instance ID'] for d in result['Instances']]
+            if built:
+                terminate_instances(*self._credentials, self.region, built)
+            return
+        # Booted once so the EBS volume exists and first-boot work is done, then parked
+        booted = [d['Instance ID'] for d in result['Instances'] if d['State'] == 'running']
+        stopped = stop_instances(*self._credentials, self.region, booted) if booted else None
+        if result['Failures'] or (stopped and stopped['Summary']['Failed']):
+            self.stats['errors'] += 1
+
+    def replenish(self):
+        members = self._refresh_members()
+        # A failed stop or a boot slower than the launch wait leaves a member running, where
+        # claim() can never take it. Only members still running a pass later are parked, since
+        # a claim in flight (possibly in another process) is running until its pool tag is removed.
+        running = {d['Instance ID'] for live in members.values() for d in live if d['State'] == 'running'}
+        stranded = sorted(running & self._seen_running)
+        self._seen_running = running - set(stranded)
+        if stranded:
+            stopped = stop_instances(*self._credentials, self.region, stranded)
+            self.stats['stranded'] += len(stranded)
+            if stopped['Summary']['Failed']:
+                self.stats['errors'] += 1
+        with self._lock:
+            targets = dict(self._targets)
+        for profile_id, target in targets.items():
+            live = members.get(profile_id, [])
+            if len(live) < target['size']:
+                self._build(profile_id, target['spec'], target['size'] - len(live))
+            elif len(live) > target['size']:
+                excess = [d['Instance ID'] for d in live if d['State'] == 'stopped'][:len(live) - target['size']]
+                if excess:
+                    terminate_instances(*self._credentials, self.region, excess)
+                    self.stats['trimmed'] += len(excess)
+            if target['size'] == 0 and not live:
+                with self._lock:
+                    if self._targets.get(profile_id, {}).get('size') == 0:
+                        del self._targets[profile_id]
+
+    def _run(self):
+        _call_context.priority = PRIORITY_BACKGROUND
+        while True:
+            self._wake.clear()
+            with self._lock:
+                if not self._targets:
+                    self._thread = None
+                    return
+            try:
+                self.replenish()
+            except Exception:
+                self.stats['errors'] += 1
+            self._wake.wait(WARM_POOL_REPLENISH_INTERVAL)
+
+    def summary(self, max_age=None):
+        with self._lock:
+            stale = max_age is not None and (self._refreshed_at is None or time.monotonic() - self._refreshed_at > max_age)
+        if stale:
+            try:
+                self._refresh_members()
+            except Exception:
+                self.stats['errors'] += 1
+        def latency(samples):
+            if not samples:
+                return None
+            ordered = sorted(samples)
+            return {
+                'count': len(ordered),
+                'p50': round(ordered[len(ordered) // 2], 3),
+                'p95': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+            }
+        with self._lock:
+            requests = self.stats['hits'] + self.stats['misses']
+            return {
+                'Hits': self.stats['hits'],
+                'Misses': self.stats['misses'],
+                'Hit Rate': round(self.stats['hits'] / requests, 3) if requests else None,
+                'Warm Launch Seconds': latency(self._latency['warm']),
+                'Cold Launch Seconds': latency(self._latency['cold']),
+                'Instances': sum(len(live) for live in self._members.values()),
+                'Profiles': {
+                    profile_id: {
+                        'Target': self._targets[profile_id]['size'] if profile_id in self._targets else 0,
+                        'Ready': sum(1 for d in self._members.get(profile_id, []) if d['State'] == 'stopped'),
+                        'Warming': sum(1 for d in self._members.get(profile_id, []) if d['State'] != 'stopped'),
+                    }
+                    for profile_id in set(self._targets) | set(self._members)
+                },
+                'Stats': dict(self.stats),
+            }
+
+_warm_pools = {}
+_warm_pools_lock = threading.Lock()
+
+def get_warm_pool(aws_access_key_id, aws_secret_access_key, region):
+    key = (_credentials_fingerprint(aws_access_key_id, aws_secret_access_key), region)
+    with _warm_pools_lock:
+        pool = _warm_pools.get(key)
+        if pool is None:
+            pool = _warm_pools[key] = WarmPool(aws_access_key_id, aws_secret_access_key, region)
+    return pool
+
+def configure_warm_pool(aws_access_key_id, aws_secret_access_key, region, size, instance_type, ami_id, key_name,
+                        subnet_id=None, volume_size=8, volume_type='gp2'):
+    pool = get_warm_pool(aws_access_key_id, aws_secret_access_key, region)
+    return pool.configure(size, instance_type, ami_id, key_name, subnet_id, volume_size, volume_type)
+
+def drain_warm_pool(aws_access_key_id, aws_secret_access_key, region):
+    return get_warm_pool(aws_access_key_id, aws_secret_access_key, region).drain()
+
+def get_warm_pool_stats(aws_access_key_id, aws_secret_access_key, region, max_age=WARM_POOL_STATS_MAX_AGE):
+    # Also lists pool instances this process did not configure, re-read at most every max_age seconds
+    return get_warm_pool(aws_access_key_id, aws_secret_access_key, region).summary(max_age)
+
+REGION_SCAN_WORKERS = 16
+REGION_CACHE_TTL = 3600
+REGION_DISCOVERY_REGION = 'us-east-1'
+
+def get_enabled_regions(aws_access_key_id, aws_secret_access_key, return_source=False):
+    def load():
+        ec2_client = get_ec2_client(aws_access_key_id, aws_secret_access_key, REGION_DISCOVERY_REGION)
+        response = ec2_client.describe_regions(AllRegions=False)
+        return sorted(r['RegionName'] for r in response['Regions'])
+    return _cached_lookup(
+        'regions', aws_access_key_id, aws_secret_access_key, None,
+        load, return_source, ttl=REGION_CACHE_TTL
+    )
+
+def scan_regions(aws_access_key_id, aws_secret_access_key, regions=None, families=None, max_workers=REGION_SCAN_WORKERS):
+    if regions is None:
+        regions = get_enabled_regions(aws_access_key_id, aws_secret_access_key)
+    families = list(families or AMI_FAMILIES)
+    lookups = {
+        'key_pairs': get_key_pairs,
+        'security_groups': get_security_groups,
+        'subnets': get_subnets,
+    }
+
+    def timed(func):
+        started = time.monotonic()
+        try:
+            return started, time.monotonic(), func(), None
+        except Exception as e:
+            return started, time.monotonic(), None, e
+
+    # Every (region, lookup) pair shares one pool, so max_workers caps the whole scan
+    timed = _with_priority(timed, _current_priority())
+    tasks = {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ec2-scan') as executor:
+        for region in regions:
+            for name, getter in lookups.items():
+                call = lambda getter=getter, region=region: getter(aws_access_key_id, aws_secret_access_key, region)
+                tasks[executor.submit(timed, call)] = (region, name)
+            for family in families:
+                # The default count shares the cache entry the AMI picker fills; the scan keeps the newest
+                call = lambda family=family, region=region: get_recent_amis(
+                    aws_access_key_id, aws_secret_access_key, region, family
+                )
+                tasks[executor.submit(timed, call)] = (region, f'ami:{family}')
+        inventory = {
+            region: {'key_pairs': [], 'security_groups': [], 'subnets': [], 'amis': {}, 'errors': {}, 'timings': {}}
+            for region in regions
+        }
+        spans = {}
+        for future in as_completed(tasks):
+            region, name = tasks[future]
+            started, finished, value, error = future.result()
+            entry = inventory[region]
+            entry['timings'][name] = round(finished - started, 3)
+            first, last = spans.get(region, (started, finished))
+            spans[region] = (min(first, started), max(last, finished))
+            if error is not None:
+                entry['errors'][name] = str(error)
+                value = None
+            if name.startswith('ami:'):
+                entry['amis'][name[4:]] = value[0] if value else None
+            elif value is not None:
+                entry[name] = value
+    for region, (first, last) in spans.items():
+        inventory[region]['seconds'] = round(last - first, 3)
+    return inventory
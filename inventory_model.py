@@ -0,0 +1,93 @@
+from bisect import bisect_left
+
+class SecurityGroupRecord:
+    __slots__ = ('id', 'name', 'vpc_id', 'label')
+
+    def __init__(self, group_id, name, vpc_id=None):
+        self.id = group_id
+        self.name = name
+        self.vpc_id = vpc_id
+        self.label = f"{name} ({group_id})"
+
+    def to_dict(self):
+        return {'GroupId': self.id, 'GroupName': self.name, 'VpcId': self.vpc_id}
+
+class SubnetRecord:
+    __slots__ = ('id', 'name', 'cidr_block', 'vpc_id', 'availability_zone', 'label')
+
+    def __init__(self, subnet_id, cidr_block, vpc_id=None, availability_zone=None, name=None):
+        self.id = subnet_id
+        self.name = name or subnet_id
+        self.cidr_block = cidr_block
+        self.vpc_id = vpc_id
+        self.availability_zone = availability_zone
+        self.label = f"{subnet_id} ({cidr_block})"
+
+    def to_dict(self):
+        return {
+            'SubnetId': self.id,
+            'CidrBlock': self.cidr_block,
+            'VpcId': self.vpc_id,
+            'AvailabilityZone': self.availability_zone,
+        }
+
+class InventoryIndex:
+    # Built once per inventory fetch; lookups by ID, label or name are dict hits
+    # and prefix search is a bisect over the sorted lower-cased names.
+
+    __slots__ = ('records', 'by_id', 'by_label', 'by_vpc', 'labels', '_names', '_search_text')
+
+    def __init__(self, records):
+        self.records = tuple(records)
+        self.by_id = {record.id: record for record in self.records}
+        self.by_label = {record.label: record for record in self.records}
+        self.by_vpc = {}
+        for record in self.records:
+            self.by_vpc.setdefault(record.vpc_id, []).append(record)
+        self.labels = [record.label for record in self.records]
+        self._names = sorted((record.name.lower(), i) for i, record in enumerate(self.records))
+        self._search_text = [f"{record.name} {record.id}".lower() for record in self.records]
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def get(self, record_id):
+        return self.by_id.get(record_id)
+
+    def ids_for_labels(self, labels):
+        return [self.by_label[label].id for label in labels if label in self.by_label]
+
+    def with_prefix(self, prefix):
+        prefix = prefix.lower()
+        start = bisect_left(self._names, (prefix, -1))
+        matches = []
+        for name, i in self._names[start:]:
+            if not name.startswith(prefix):
+                break
+            matches.append(self.records[i])
+        return matches
+
+    def search(self, text):
+        text = text.lower()
+        return [record for record, haystack in zip(self.records, self._search_text) if text in haystack]
+
+    def in_vpc(self, vpc_id):
+        return self.by_vpc.get(vpc_id, [])
+
+    def to_dicts(self):
+        return [record.to_dict() for record in self.records]
+
+def build_security_group_index(security_groups):
+    return InventoryIndex(
+        SecurityGroupRecord(sg['GroupId'], sg['GroupName'], sg.get('VpcId')) for sg in security_groups
+    )
+
+def build_subnet_index(subnets):
+    records = []
+    for sn in subnets:
+        name = next((tag['Value'] for tag in sn.get('Tags') or [] if tag.get('Key') == 'Name'), None)
+        records.append(SubnetRecord(sn['SubnetId'], sn['CidrBlock'], sn.get('VpcId'), sn.get('AvailabilityZone'), name))
+    return InventoryIndex(records)
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+from ec2_launcher import (
+    PRIORITY_BACKGROUND, _credentials_fingerprint, api_priority, invalidate_cache,
+    get_key_pairs, get_security_groups, get_subnets, get_iam_roles, get_recent_amis
+)
+from inventory_model import build_security_group_index, build_subnet_index
+import metrics
+
+SNAPSHOT_DIR = os.environ.get('EC2_LAUNCHER_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'ec2-launcher'))
+SNAPSHOT_FILE = 'inventory.sqlite3'
+SNAPSHOT_MAX_AGE = 300
+REFRESH_LEASE_SECONDS = 60
+REFRESH_WORKERS = 2
+MAX_DECODED_SNAPSHOTS = 64
+# Rows for accounts or regions nobody has looked up in a week are dropped
+SNAPSHOT_RETENTION = 7 * 24 * 3600
+PRUNE_INTERVAL = 3600
+
+# Resources that are served as an InventoryIndex rather than a plain list
+INDEX_BUILDERS = {
+    'security_groups': build_security_group_index,
+    'subnets': build_subnet_index,
+}
+
+# name -> (in-memory cache key to drop before refreshing, loader)
+SNAPSHOT_RESOURCES = {
+    'key_pairs': ('key_pairs', get_key_pairs),
+    'security_groups': ('security_groups', get_security_groups),
+    'subnets': ('subnets', get_subnets),
+    'iam_roles': ('iam_roles', get_iam_roles),
+}
+
+_refresh_executor = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix='ec2-snapshot')
+_inflight_lock = threading.Lock()
+_inflight = set()
+_schema_ready = set()
+_pruned_at = {}
+_refresh_errors_lock = threading.Lock()
+_refresh_errors = {}
+_decoded_lock = threading.Lock()
+_decoded = OrderedDict()
+
+def _snapshot_resource(name):
+    if name in SNAPSHOT_RESOURCES:
+        return SNAPSHOT_RESOURCES[name]
+    if name.startswith('amis:'):
+        family = name[5:]
+        def load_amis(aws_access_key_id, aws_secret_access_key, region):
+            return get_recent_amis(aws_access_key_id, aws_secret_access_key, region, family)
+        return f'amis:{family}:3', load_amis
+    raise ValueError(f"Unknown snapshot resource: {name}")
+
+def _connect():
+    path = os.path.join(SNAPSHOT_DIR, SNAPSHOT_FILE)
+    if path not in _schema_ready:
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    # WAL plus a busy timeout lets several server processes share the file
+    connection = sqlite3.connect(path, timeout=10, isolation_level=None)
+    if path not in _schema_ready:
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('''
+            CREATE TABLE IF NOT EXISTS snapshots (
+                account TEXT NOT NULL,
+                region TEXT NOT NULL,
+                resource TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                lease_until REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (account, region, resource)
+            )
+        ''')
+        _schema_ready.add(path)
+    now = time.time()
+    if now - _pruned_at.get(path, 0) > PRUNE_INTERVAL:
+        _pruned_at[path] = now
+        connection.execute('DELETE FROM snapshots WHERE fetched_at < ?', (now - SNAPSHOT_RETENTION,))
+    return connection
+
+def _decode(resource, value):
+    builder = INDEX_BUILDERS.get(resource)
+    return builder(value) if builder else value
+
+def load_snapshot(aws_access_key_id, aws_secret_access_key, region, resource):
+    account = _credentials_fingerprint(aws_access_key_id, aws_secret_access_key)
+    with closing(_connect()) as connection:
+        row = connection.execute(
+            'SELECT digest, fetched_at FROM snapshots WHERE account = ? AND region = ? AND resource = ?',
+            (account, region, resource)
+        ).fetchone()
+        if row is None:
+            return None
+        digest, fetched_at = row
+        # Unchanged payloads are decoded (and indexed) once per process, not once per rerun
+        memo_key = (account, region, resource, digest)
+        with _decoded_lock:
+            value = _decoded.get(memo_key)
+            if value is not None:
+                _decoded.move_to_end(memo_key)
+                return value, fetched_at
+        payload = connection.execute(
+            'SELECT payload FROM snapshots WHERE account = ? AND region = ? AND resource = ? AND digest = ?',
+            (account, region, resource, digest)
+        ).fetchone()
+    if payload is None:
+        return None
+    value = _decode(resource, json.loads(payload[0]))
+    with _decoded_lock:
+        _decoded[memo_key] = value
+        while len(_decoded) > MAX_DECODED_SNAPSHOTS:
+            _decoded.popitem(last=False)
+    return value, fetched_at
+
+def save_snapshot(aws_access_key_id, aws_secret_access_key, region, resource, value):
+    account = _credentials_fingerprint(aws_access_key_id, aws_secret_access_key)
+    payload = json.dumps(value, sort_keys=True, default=str)
+    digest = hashlib.sha256(payload.encode()).hexdigest()
+    now = time.time()
+    with closing(_connect()) as connection:
+        # Unchanged data only bumps the timestamp instead of rewriting the payload
+        updated = connection.execute(
+            'UPDATE snapshots SET fetched_at = ?, lease_until = 0 '
+            'WHERE account = ? AND region = ? AND resource = ? AND digest = ?',
+            (now, account, region, resource, digest)
+        ).rowcount
+        if updated:
+            return False
+        connection.execute(
+            'INSERT OR REPLACE INTO snapshots (account, region, resource, payload, digest, fetched_at, lease_until) '
+            'VALUES (?, ?, ?, ?, ?, ?, 0)',
+            (account, region, resource, payload, digest, now)
+        )
+    return True
+
+def invalidate_snapshot(aws_access_key_id, aws_secret_access_key, region, resource):
+    account = _credentials_fingerprint(aws_access_key_id, aws_secret_access_key)
+    with closing(_connect()) as connection:
+        connection.execute(
+            'DELETE FROM snapshots WHERE account = ? AND region = ? AND resource = ?',
+            (account, region, resource)
+        )
+
+def _claim_refresh(account, region, resource):
+    now = time.time()
+    with closing(_connect()) as connection:
+        claimed = connection.execute(
+            'UPDATE snapshots SET lease_until = ? WHERE account = ? AND region = ? AND resource = ? AND lease_until < ?',
+            (now + REFRESH_LEASE_SECONDS, account, region, resource, now)
+        ).rowcount
+    return claimed == 1
+
+def refresh_snapshot(aws_access_key_id, aws_secret_access_key, region, resource):
+    cache_key, loader = _snapshot_resource(resource)
+    invalidate_cache(cache_key, aws_access_key_id, aws_secret_access_key, None if resource == 'iam_roles' else region)
+    value = loader(aws_access_key_id, aws_secret_access_key, region)
+    changed = save_snapshot(aws_access_key_id, aws_secret_access_key, region, resource, value)
+    with _refresh_errors_lock:
+        _refresh_errors.pop((_credentials_fingerprint(aws_access_key_id, aws_secret_access_key), region, resource), None)
+    return _decode(resource, value), changed
+
+def _refresh_in_background(aws_access_key_id, aws_secret_access_key, region, resource):
+    account = _credentials_fingerprint(aws_access_key_id, aws_secret_access_key)
+    key = (account, region, resource)
+    with _inflight_lock:
+        if key in _inflight:
+            return False
+        _inflight.add(key)
+    # The lease keeps other processes sharing the file from refreshing the same entry
+    if not _claim_refresh(account, region, resource):
+        with _inflight_lock:
+            _inflight.discard(key)
+        return False
+
+    def run():
+        try:
+            with api_priority(PRIORITY_BACKGROUND):
+                refresh_snapshot(aws_access_key_id, aws_secret_access_key, region, resource)
+        except Exception as e:
+            # The stale snapshot keeps being served; the failure is surfaced through refresh_errors()
+            metrics.inc('snapshot_refresh_failures_total', resource=resource.split(':')[0])
+            with _refresh_errors_lock:
+                _refresh_errors[key] = str(e)
+        finally:
+            with _inflight_lock:
+                _inflight.discard(key)
+    _refresh_executor.submit(run)
+    return True
+
+def refresh_errors(aws_access_key_id, aws_secret_access_key, region):
+    # resource -> error of the last background refresh that failed, until one succeeds
+    account = _credentials_fingerprint(aws_access_key_id, aws_secret_access_key)
+    with _refresh_errors_lock:
+        return {
+            resource: error for (error_account, error_region, resource), error in _refresh_errors.items()
+            if error_account == account and error_region == region
+        }
+
+def snapshot_lookup(aws_access_key_id, aws_secret_access_key, region, resource, max_age=SNAPSHOT_MAX_AGE, force=False):
+    snapshot = None
+    if not force:
+        try:
+            snapshot = load_snapshot(aws_access_key_id, aws_secret_access_key, region, resource)
+        except sqlite3.Error:
+            snapshot = None
+    if snapshot is None:
+        value, _ = refresh_snapshot(aws_access_key_id, aws_secret_access_key, region, resource)
+        return value, 'aws'
+    value, fetched_at = snapshot
+    if time.time() - fetched_at > max_age:
+        _refresh_in_background(aws_access_key_id, aws_secret_access_key, region, resource)
+        return value, 'snapshot (refreshing)'
+    return value, 'snapshot'
@@ -0,0 +1,151 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRIC_PREFIX = 'ec2_launcher_'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self):
+        total, out = 0, []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            out.append((bound, total))
+        return out
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def inc(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name, seconds, **labels):
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+@contextmanager
+def timed(name, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+def snapshot():
+    with _lock:
+        counters = [
+            {'name': name, 'labels': dict(labels), 'value': value}
+            for (name, labels), value in sorted(_counters.items())
+        ]
+        histograms = [
+            {
+                'name': name,
+                'labels': dict(labels),
+                'count': histogram.count,
+                'sum': round(histogram.sum, 6),
+                'buckets': {str(bound): total for bound, total in histogram.cumulative()},
+            }
+            for (name, labels), histogram in sorted(_histograms.items())
+        ]
+    return {'counters': counters, 'histograms': histograms}
+
+def dump_json(path=None):
+    data = json.dumps(snapshot(), indent=2)
+    if path:
+        with open(path, 'w') as f:
+            f.write(data)
+    return data
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + (extra or [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+def render_prometheus():
+    lines = []
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, (h.cumulative(), h.sum, h.count)) for key, h in _histograms.items())
+    typed = set()
+    for (name, labels), value in counters:
+        full = METRIC_PREFIX + name
+        if full not in typed:
+            lines.append(f'# TYPE {full} counter')
+            typed.add(full)
+        lines.append(f'{full}{_format_labels(labels)} {value}')
+    for (name, labels), (cumulative, total, count) in histograms:
+        full = METRIC_PREFIX + name
+        if full not in typed:
+            lines.append(f'# TYPE {full} histogram')
+            typed.add(full)
+        for bound, running in cumulative:
+            lines.append(f'{full}_bucket{_format_labels(labels, [("le", bound)])} {running}')
+        lines.append(f'{full}_bucket{_format_labels(labels, [("le", "+Inf")])} {count}')
+        lines.append(f'{full}_sum{_format_labels(labels)} {total:.6f}')
+        lines.append(f'{full}_count{_format_labels(labels)} {count}')
+    return '\n'.join(lines) + '\n'
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/metrics':
+            body, content_type = render_prometheus().encode(), 'text/plain; version=0.0.4'
+        elif self.path == '/metrics.json':
+            body, content_type = dump_json().encode(), 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_server = None
+
+def serve_metrics(port, host='127.0.0.1'):
+    global _server
+    with _lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name='metrics-http', daemon=True).start()
+    return _server
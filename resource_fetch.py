@@ -0,0 +1,35 @@
+from functools import partial
+
+from ec2_launcher import iter_parallel, submit_parallel
+from inventory_model import build_security_group_index, build_subnet_index
+from inventory_snapshot import snapshot_lookup
+
+RESOURCE_FETCH_TIMEOUT = 15
+RESOURCE_FETCH_TIMEOUTS = {'IAM roles': 25}
+
+# Display name -> snapshot resource, in the order the launch form uses them
+RESOURCES = {
+    'Key pairs': 'key_pairs',
+    'Security groups': 'security_groups',
+    'Subnets': 'subnets',
+    'IAM roles': 'iam_roles',
+}
+
+EMPTY_RESOURCES = {'Security groups': build_security_group_index([]), 'Subnets': build_subnet_index([])}
+
+def start_resource_fetch(aws_access_key_id, aws_secret_access_key, region, force=False):
+    # Lookups come from the on-disk snapshot when possible and run in the background
+    return submit_parallel({
+        name: partial(snapshot_lookup, aws_access_key_id, aws_secret_access_key, region, resource, force=force)
+        for name, resource in RESOURCES.items()
+    })
+
+def collect_resources(resource_futures):
+    # A lookup that fails or times out yields an empty value, so callers can still render
+    results, sources, errors = {}, {}, {}
+    for name, value, error in iter_parallel(resource_futures, RESOURCE_FETCH_TIMEOUT, RESOURCE_FETCH_TIMEOUTS):
+        if error is not None:
+            results[name], sources[name], errors[name] = EMPTY_RESOURCES.get(name, []), 'error', error
+        else:
+            results[name], sources[name] = value
+    return results, sources, errors
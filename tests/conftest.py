@@ -0,0 +1,69 @@
+import itertools
+
+import pytest
+
+import ec2_launcher
+from benchmark import BENCH_REGION, FakeAWSBackend
+
+_account_numbers = itertools.count()
+
+class FakeAccount:
+    # One simulated account per test: fresh credentials keep pooled clients, caches
+    # and trackers from picking up another test's backend or state.
+
+    def __init__(self, pending_seconds):
+        number = next(_account_numbers)
+        self.key = f'TEST{number:04d}'
+        self.secret = f'test-secret-{number}'
+        self.region = BENCH_REGION
+        self.backend = FakeAWSBackend('small', pending_seconds=pending_seconds)
+        self.ec2 = ec2_launcher.get_ec2_client(*self.credentials)
+        self._hooks = []
+        for client in (self.ec2, ec2_launcher.get_iam_client(*self.credentials),
+                       ec2_launcher.get_ec2_resource(*self.credentials).meta.client):
+            self.backend.attach(client)
+
+    @property
+    def credentials(self):
+        return self.key, self.secret, self.region
+
+    def hook(self, event, handler):
+        # Registered on the pooled EC2 client and removed when the test ends
+        self.ec2.meta.events.register(event, handler)
+        self._hooks.append((event, handler))
+
+    def count_calls(self, operation):
+        calls = []
+        self.hook(f'before-call.ec2.{operation}', lambda **kwargs: calls.append(1))
+        return calls
+
+    def run_instances(self, count=1, tags=None):
+        args = {'ImageId': 'ami-00000001', 'InstanceType': 't3.micro', 'MinCount': count, 'MaxCount': count}
+        if tags:
+            args['TagSpecifications'] = [{'ResourceType': 'instance', 'Tags': [
+                {'Key': key, 'Value': value} for key, value in tags.items()
+            ]}]
+        return [instance['InstanceId'] for instance in self.ec2.run_instances(**args)['Instances']]
+
+    def state(self, instance_id):
+        reservations = self.ec2.describe_instances(InstanceIds=[instance_id])['Reservations']
+        return reservations[0]['Instances'][0]['State']['Name']
+
+    def close(self):
+        for event, handler in self._hooks:
+            self.ec2.meta.events.unregister(event, handler)
+
+@pytest.fixture
+def fake_aws():
+    accounts = []
+    def make(pending_seconds=0.01):
+        account = FakeAccount(pending_seconds)
+        accounts.append(account)
+        return account
+    yield make
+    for account in accounts:
+        account.close()
+
+@pytest.fixture
+def aws(fake_aws):
+    return fake_aws()
@@ -0,0 +1,42 @@
+import io
+import json
+
+import pytest
+
+import inventory_snapshot
+from batch_launch import InventoryResolver, PendingLaunches, ResultWriter, launch_spec
+
+SPEC = {'instance_type': 't3.micro', 'ami_id': 'ami-00000001', 'key_name': 'key-0'}
+
+@pytest.fixture(autouse=True)
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(inventory_snapshot, 'SNAPSHOT_DIR', str(tmp_path))
+
+def _launch(aws, spec, timeout=10):
+    key, secret, region = aws.credentials
+    output = io.StringIO()
+    writer = ResultWriter(output)
+    pending = PendingLaunches(writer, timeout)
+    launch_spec(key, secret, InventoryResolver(key, secret), writer, 0, spec, region, pending)
+    return output, writer, pending
+
+def test_worker_returns_before_instances_settle(fake_aws):
+    aws = fake_aws(pending_seconds=0.3)
+
+    output, writer, pending = _launch(aws, dict(SPEC, count=2))
+
+    assert output.getvalue() == ''
+    pending.wait()
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [line['State'] for line in lines] == ['running', 'running']
+    assert writer.succeeded == 2 and writer.failed == 0
+
+def test_unsettled_instances_time_out(fake_aws):
+    aws = fake_aws(pending_seconds=30)
+
+    output, writer, pending = _launch(aws, SPEC, timeout=0.2)
+    pending.wait()
+
+    line, = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert line['Error'] == 'Timed out waiting for instance to start running'
+    assert writer.failed == 1
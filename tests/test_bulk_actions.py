@@ -0,0 +1,22 @@
+from botocore.exceptions import ClientError
+
+import ec2_launcher
+
+def test_ineligible_instance_does_not_fail_its_chunk(aws):
+    instance_ids = aws.run_instances(count=4)
+    ineligible = instance_ids[2]
+
+    def reject_ineligible(params, **kwargs):
+        if ineligible in params['InstanceIds']:
+            raise ClientError(
+                {'Error': {'Code': 'IncorrectInstanceState', 'Message': f'{ineligible} is not in a state to stop'}},
+                'StopInstances'
+            )
+
+    aws.hook('before-parameter-build.ec2.StopInstances', reject_ineligible)
+
+    outcome = ec2_launcher.stop_instances(*aws.credentials, instance_ids)
+
+    failed = [result['Instance ID'] for result in outcome['Results'] if result['Error']]
+    assert failed == [ineligible]
+    assert outcome['Summary']['Succeeded'] == 3
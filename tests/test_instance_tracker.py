@@ -0,0 +1,33 @@
+from botocore.exceptions import EndpointConnectionError
+
+import ec2_launcher
+
+def _tracker(aws):
+    return ec2_launcher.InstanceStateTracker(*aws.credentials, min_interval=0.01, max_interval=0.05)
+
+def test_tracker_survives_failed_poll(aws):
+    failures = []
+
+    def fail_first_poll(**kwargs):
+        if not failures:
+            failures.append(1)
+            raise EndpointConnectionError(endpoint_url='https://ec2.us-east-1.amazonaws.com')
+
+    aws.hook('before-call.ec2.DescribeInstances', fail_first_poll)
+    instance_id, = aws.run_instances()
+    tracker = _tracker(aws)
+
+    results = tracker.wait_for([instance_id], timeout=10)
+
+    assert failures
+    assert tracker.stats['errors'] == 1
+    assert results[instance_id]['State'] == 'running'
+
+def test_wait_for_stops_watching_what_it_added(aws):
+    instance_id, = aws.run_instances()
+    tracker = _tracker(aws)
+
+    tracker.wait_for([instance_id], timeout=10)
+
+    assert instance_id not in tracker.watching()
+    assert tracker.get(instance_id)['State'] == 'running'
@@ -0,0 +1,77 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import ec2_launcher
+
+def test_lookups_are_served_from_cache_until_invalidated(aws):
+    describes = aws.count_calls('DescribeKeyPairs')
+
+    first, source = ec2_launcher.get_key_pairs(*aws.credentials, return_source=True)
+    second, cached = ec2_launcher.get_key_pairs(*aws.credentials, return_source=True)
+
+    assert (source, cached) == ('aws', 'cache')
+    assert first == second
+    assert len(describes) == 1
+
+    assert ec2_launcher.invalidate_cache('key_pairs', aws.key, aws.secret, aws.region) == 1
+    ec2_launcher.get_key_pairs(*aws.credentials)
+    assert len(describes) == 2
+
+def test_expired_entries_are_reloaded(aws, monkeypatch):
+    monkeypatch.setitem(ec2_launcher.CACHE_TTLS, 'key_pairs', 0)
+    describes = aws.count_calls('DescribeKeyPairs')
+
+    ec2_launcher.get_key_pairs(*aws.credentials)
+    _, source = ec2_launcher.get_key_pairs(*aws.credentials, return_source=True)
+
+    assert source == 'aws'
+    assert len(describes) == 2
+
+def test_cached_lists_are_copies(aws):
+    ec2_launcher.get_key_pairs(*aws.credentials).append('tampered')
+
+    assert 'tampered' not in ec2_launcher.get_key_pairs(*aws.credentials)
+
+def test_slow_call_only_times_out_itself():
+    release = threading.Event()
+    futures = ec2_launcher.submit_parallel({'fast': lambda: 'done', 'slow': lambda: release.wait(5)})
+    try:
+        results = {name: (value, error) for name, value, error in ec2_launcher.iter_parallel(futures, timeout=0.2)}
+    finally:
+        release.set()
+
+    assert results['fast'] == ('done', None)
+    assert results['slow'][0] is None
+    assert isinstance(results['slow'][1], TimeoutError)
+
+def test_per_call_timeout_overrides_default():
+    release = threading.Event()
+    futures = ec2_launcher.submit_parallel({'slow': lambda: release.wait(5) and 'late'})
+    timer = threading.Timer(0.2, release.set)
+    timer.start()
+
+    (name, value, error), = ec2_launcher.iter_parallel(futures, timeout=0.05, timeouts={'slow': 2})
+
+    assert (name, value, error) == ('slow', 'late', None)
+
+def test_timeout_starts_when_the_call_starts():
+    # One worker: 'queued' waits behind 'busy' for longer than its own timeout
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        futures = ec2_launcher.submit_parallel(
+            {'busy': lambda: time.sleep(0.3) or 'busy', 'queued': lambda: 'queued'}, executor=executor
+        )
+
+        results = {name: (value, error) for name, value, error in ec2_launcher.iter_parallel(futures, timeout=0.2)}
+
+    assert isinstance(results['busy'][1], TimeoutError)
+    assert results['queued'] == ('queued', None)
+
+def test_region_scan_reuses_the_ami_picker_cache(aws):
+    newest = ec2_launcher.get_recent_amis(*aws.credentials, 'ubuntu')
+    describes = aws.count_calls('DescribeImages')
+
+    inventory = ec2_launcher.scan_regions(aws.key, aws.secret, regions=[aws.region], families=['ubuntu'])
+
+    assert inventory[aws.region]['amis']['ubuntu'] == newest[0]
+    assert describes == []
@@ -0,0 +1,33 @@
+from inventory_model import build_security_group_index, build_subnet_index
+
+GROUPS = [
+    {'GroupId': 'sg-1', 'GroupName': 'web-frontend', 'VpcId': 'vpc-a'},
+    {'GroupId': 'sg-2', 'GroupName': 'Web-Backend', 'VpcId': 'vpc-a'},
+    {'GroupId': 'sg-3', 'GroupName': 'database', 'VpcId': 'vpc-b'},
+    {'GroupId': 'sg-4', 'GroupName': 'webhooks', 'VpcId': 'vpc-b'},
+]
+
+def test_with_prefix_is_case_insensitive_and_sorted():
+    index = build_security_group_index(GROUPS)
+
+    assert [r.id for r in index.with_prefix('WEB')] == ['sg-2', 'sg-1', 'sg-4']
+    assert [r.id for r in index.with_prefix('web-')] == ['sg-2', 'sg-1']
+    assert index.with_prefix('zzz') == []
+    assert len(index.with_prefix('')) == len(GROUPS)
+
+def test_lookups_by_id_label_and_vpc():
+    index = build_security_group_index(GROUPS)
+
+    assert index.get('sg-3').name == 'database'
+    assert index.ids_for_labels(['database (sg-3)', 'missing (sg-9)']) == ['sg-3']
+    assert [r.id for r in index.in_vpc('vpc-b')] == ['sg-3', 'sg-4']
+    assert [r.id for r in index.search('BACK')] == ['sg-2']
+
+def test_subnet_name_comes_from_name_tag():
+    index = build_subnet_index([
+        {'SubnetId': 'subnet-1', 'CidrBlock': '10.0.0.0/24', 'Tags': [{'Key': 'Name', 'Value': 'public'}]},
+        {'SubnetId': 'subnet-2', 'CidrBlock': '10.0.1.0/24'},
+    ])
+
+    assert [r.id for r in index.with_prefix('pub')] == ['subnet-1']
+    assert index.get('subnet-2').name == 'subnet-2'
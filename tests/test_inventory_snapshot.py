@@ -0,0 +1,78 @@
+import threading
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+
+import inventory_snapshot
+import metrics
+
+@pytest.fixture(autouse=True)
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(inventory_snapshot, 'SNAPSHOT_DIR', str(tmp_path))
+
+def _wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_first_lookup_fetches_then_serves_snapshot(aws):
+    describes = aws.count_calls('DescribeKeyPairs')
+
+    value, source = inventory_snapshot.snapshot_lookup(*aws.credentials, 'key_pairs')
+    again, snapshot_source = inventory_snapshot.snapshot_lookup(*aws.credentials, 'key_pairs')
+
+    assert (source, snapshot_source) == ('aws', 'snapshot')
+    assert value == again
+    assert len(describes) == 1
+
+def test_stale_snapshot_refreshes_once_under_lease(aws):
+    inventory_snapshot.snapshot_lookup(*aws.credentials, 'key_pairs')
+    release = threading.Event()
+    describes = []
+
+    def slow_refresh(**kwargs):
+        describes.append(1)
+        release.wait(5)
+
+    aws.hook('before-call.ec2.DescribeKeyPairs', slow_refresh)
+    try:
+        sources = [inventory_snapshot.snapshot_lookup(*aws.credentials, 'key_pairs', max_age=0)[1] for _ in range(3)]
+        assert _wait_until(lambda: describes)
+    finally:
+        release.set()
+
+    assert sources == ['snapshot (refreshing)'] * 3
+    assert _wait_until(lambda: inventory_snapshot.snapshot_lookup(*aws.credentials, 'key_pairs')[1] == 'snapshot')
+    assert len(describes) == 1
+
+def test_rows_past_retention_are_pruned_on_connect(aws, monkeypatch):
+    inventory_snapshot.save_snapshot(*aws.credentials, 'key_pairs', ['key-0'])
+    monkeypatch.setattr(inventory_snapshot, 'SNAPSHOT_RETENTION', 0)
+    monkeypatch.setattr(inventory_snapshot, 'PRUNE_INTERVAL', 0)
+    time.sleep(0.01)
+
+    assert inventory_snapshot.load_snapshot(*aws.credentials, 'key_pairs') is None
+
+def _refresh_failures():
+    return sum(c['value'] for c in metrics.snapshot()['counters'] if c['name'] == 'snapshot_refresh_failures_total')
+
+def test_failed_background_refresh_is_counted_and_reported(aws):
+    inventory_snapshot.snapshot_lookup(*aws.credentials, 'key_pairs')
+    failures_before = _refresh_failures()
+
+    def deny(**kwargs):
+        raise ClientError({'Error': {'Code': 'UnauthorizedOperation', 'Message': 'denied'}}, 'DescribeKeyPairs')
+
+    aws.hook('before-call.ec2.DescribeKeyPairs', deny)
+    value, source = inventory_snapshot.snapshot_lookup(*aws.credentials, 'key_pairs', max_age=0)
+
+    assert source == 'snapshot (refreshing)'
+    assert _wait_until(lambda: 'key_pairs' in inventory_snapshot.refresh_errors(*aws.credentials))
+    assert 'denied' in inventory_snapshot.refresh_errors(*aws.credentials)['key_pairs']
+    assert _refresh_failures() == failures_before + 1
+
+    aws.close()
+    inventory_snapshot.snapshot_lookup(*aws.credentials, 'key_pairs', force=True)
+    assert inventory_snapshot.refresh_errors(*aws.credentials) == {}
@@ -0,0 +1,76 @@
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+import ec2_launcher
+
+LAUNCH = {'instance_type': 't3.micro', 'ami_id': 'ami-00000001', 'key_name': 'key-0'}
+
+def test_instances_that_die_count_as_failed(aws):
+    killed = []
+
+    def kill_first(parsed, **kwargs):
+        # Stands in for an instance that AWS terminates right after launch (e.g. no capacity)
+        if not killed:
+            killed.append(parsed['Instances'][0]['InstanceId'])
+            aws.ec2.terminate_instances(InstanceIds=killed)
+
+    aws.hook('after-call.ec2.RunInstances', kill_first)
+
+    fleet = ec2_launcher.launch_instances(*aws.credentials, count=4, **LAUNCH)
+
+    assert fleet['Summary']['Launched'] == 4
+    assert fleet['Summary']['Running'] == 3
+    assert fleet['Summary']['Failed'] == 1
+    failure, = fleet['Failures']
+    assert failure['Instances'] == killed
+    assert failure['Error'].startswith('Instances entered state')
+
+def _not_found_once(aws):
+    raised = []
+
+    def not_found(**kwargs):
+        # DescribeInstances is eventually consistent right after RunInstances
+        if not raised:
+            raised.append(1)
+            raise ClientError(
+                {'Error': {'Code': 'InvalidInstanceID.NotFound', 'Message': 'The instance ID does not exist'}},
+                'DescribeInstances'
+            )
+
+    aws.hook('before-call.ec2.DescribeInstances', not_found)
+
+def test_no_wait_launch_reports_instances_from_run_response(aws):
+    _not_found_once(aws)
+
+    fleet = ec2_launcher.launch_instances(*aws.credentials, count=2, wait=False, **LAUNCH)
+
+    assert fleet['Summary']['Launched'] == 2
+    assert [details['State'] for details in fleet['Instances']] == ['pending', 'pending']
+    assert fleet['Failures'] == []
+
+def test_launch_job_survives_not_found_after_launch(aws):
+    _not_found_once(aws)
+
+    job_id = ec2_launcher.submit_launch_job(*aws.credentials, **LAUNCH)
+    deadline = time.monotonic() + 10
+    while ec2_launcher.get_launch_job(job_id)['Status'] not in ec2_launcher.JOB_DONE_STATUSES and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    job = ec2_launcher.get_launch_job(job_id)
+    assert job['Status'] == 'running'
+    assert len(job['Instances']) == 1
+
+def test_calls_on_pool_workers_are_timed_under_the_callers_scope(aws):
+    other_thread = threading.Thread(target=aws.run_instances)
+    ec2_launcher.set_api_scope('rerun-1')
+    try:
+        ec2_launcher.launch_instances(*aws.credentials, count=1, wait=False, preflight=False, **LAUNCH)
+        other_thread.start()
+        other_thread.join()
+    finally:
+        ec2_launcher.set_api_scope(None)
+
+    timings = ec2_launcher.get_scope_timings('rerun-1')
+    assert timings[('ec2', 'RunInstances')][0] == 1
@@ -0,0 +1,25 @@
+import time
+
+import ec2_launcher
+
+def _wait_for_status(job_id, status, timeout=10):
+    deadline = time.monotonic() + timeout
+    while ec2_launcher.get_launch_job(job_id)['Status'] != status and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return ec2_launcher.get_launch_job(job_id)
+
+def test_timed_out_job_stops_being_polled(fake_aws, monkeypatch):
+    aws = fake_aws(pending_seconds=60)
+    tracker = ec2_launcher.get_instance_tracker(*aws.credentials)
+
+    job_id = ec2_launcher.submit_launch_job(
+        *aws.credentials, instance_type='t3.micro', ami_id='ami-00000001', key_name='key-0'
+    )
+    job = _wait_for_status(job_id, 'pending')
+    assert job['Status'] == 'pending'
+    instance_id = job['Instances'][0]['Instance ID']
+    assert instance_id in tracker.watching()
+
+    monkeypatch.setattr(ec2_launcher, 'TRACKER_WAIT_TIMEOUT', 0)
+    assert ec2_launcher.get_launch_job(job_id)['Status'] == 'timed out'
+    assert instance_id not in tracker.watching()
@@ -0,0 +1,33 @@
+from botocore.exceptions import EndpointConnectionError
+
+import ec2_launcher
+
+LAUNCH = {'instance_type': 't3.micro', 'ami_id': 'ami-00000001', 'key_name': 'key-0'}
+
+def test_pass_with_skipped_check_is_not_trusted_for_long(aws, monkeypatch):
+    monkeypatch.setattr(ec2_launcher, 'PREFLIGHT_FAILURE_TTL', 0)
+    unreachable = []
+
+    def fail_key_pairs(**kwargs):
+        if not unreachable:
+            unreachable.append(1)
+            raise EndpointConnectionError(endpoint_url='https://ec2.us-east-1.amazonaws.com')
+
+    aws.hook('before-call.ec2.DescribeKeyPairs', fail_key_pairs)
+
+    first = ec2_launcher.preflight_launch(*aws.credentials, **LAUNCH)
+    second = ec2_launcher.preflight_launch(*aws.credentials, **LAUNCH)
+    third = ec2_launcher.preflight_launch(*aws.credentials, **LAUNCH)
+
+    assert first['OK'] and first['Skipped'] == ['key_pair']
+    assert not second['Cached'] and second['Skipped'] == []
+    assert third['Cached']
+
+def test_unknown_ami_answer_is_cached(aws):
+    describes = aws.count_calls('DescribeImages')
+    launch = dict(LAUNCH, ami_id='ami-ffffffff')
+
+    verdicts = [ec2_launcher.preflight_launch(*aws.credentials, force=True, **launch) for _ in range(3)]
+
+    assert all('AMI ami-ffffffff was not found in us-east-1' in v['Errors'] for v in verdicts)
+    assert len(describes) == 1
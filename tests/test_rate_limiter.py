@@ -0,0 +1,70 @@
+import threading
+import time
+
+import ec2_launcher
+from ec2_launcher import PRIORITY_BACKGROUND, PRIORITY_URGENT, TokenBucket
+
+def test_burst_is_served_without_waiting():
+    bucket = TokenBucket(rate=1.0, burst=3)
+
+    waits = [bucket.acquire() for _ in range(3)]
+
+    assert max(waits) < 0.05
+    assert bucket.stats['calls'] == 3
+
+def test_urgent_waiter_goes_before_earlier_background_waiter():
+    bucket = TokenBucket(rate=10.0, burst=1)
+    bucket.acquire()
+    order = []
+
+    def take(priority, label):
+        bucket.acquire(priority)
+        order.append(label)
+
+    background = threading.Thread(target=take, args=(PRIORITY_BACKGROUND, 'background'))
+    background.start()
+    time.sleep(0.02)
+    urgent = threading.Thread(target=take, args=(PRIORITY_URGENT, 'urgent'))
+    urgent.start()
+    background.join(2)
+    urgent.join(2)
+
+    assert order == ['urgent', 'background']
+
+def test_throttling_halves_rate_and_success_recovers_it():
+    bucket = TokenBucket(rate=8.0, burst=1)
+
+    bucket.on_throttle()
+    bucket.on_throttle()
+    assert bucket.rate == 2.0
+    assert bucket.stats['throttles'] == 2
+
+    for _ in range(100):
+        bucket.on_success()
+    assert bucket.rate == 8.0
+
+def test_throttling_never_drops_below_floor():
+    bucket = TokenBucket(rate=1.0, burst=1)
+
+    for _ in range(20):
+        bucket.on_throttle()
+
+    assert bucket.rate == ec2_launcher.RATE_LIMIT_FLOOR
+
+def test_caller_priority_follows_work_onto_pool_threads(aws):
+    seen = {}
+
+    def record(model, **kwargs):
+        seen.setdefault(model.name, set()).add(ec2_launcher._current_priority())
+
+    for operation in ('RunInstances', 'StopInstances'):
+        aws.hook(f'before-call.ec2.{operation}', record)
+    instance_ids = aws.run_instances(count=2)
+    seen.clear()
+
+    with ec2_launcher.api_priority(PRIORITY_BACKGROUND):
+        ec2_launcher.launch_instances(*aws.credentials, count=1, wait=False, preflight=False,
+                                      instance_type='t3.micro', ami_id='ami-00000001', key_name='key-0')
+        ec2_launcher.stop_instances(*aws.credentials, instance_ids)
+
+    assert seen == {'RunInstances': {PRIORITY_BACKGROUND}, 'StopInstances': {PRIORITY_BACKGROUND}}
@@ -0,0 +1,70 @@
+import time
+
+from botocore.exceptions import ClientError
+
+import ec2_launcher
+
+LAUNCH = {'instance_type': 't3.micro', 'ami_id': 'ami-00000001', 'key_name': 'key-0'}
+
+def _wait_until(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+def test_replenish_parks_members_left_running(aws, monkeypatch):
+    monkeypatch.setattr(ec2_launcher, 'WARM_POOL_REPLENISH_INTERVAL', 0.05)
+    profile_id = ec2_launcher.warm_profile_id(**LAUNCH)
+    instance_id, = aws.run_instances(tags={ec2_launcher.WARM_POOL_TAG: profile_id})
+    time.sleep(0.05)
+
+    ec2_launcher.configure_warm_pool(*aws.credentials, 1, **LAUNCH)
+
+    assert _wait_until(lambda: aws.state(instance_id) in ('stopping', 'stopped'))
+    assert _wait_until(lambda: ec2_launcher.get_warm_pool_stats(*aws.credentials)['Stats']['stranded'] == 1)
+    ec2_launcher.drain_warm_pool(*aws.credentials)
+
+def test_launch_with_user_data_skips_pool(aws):
+    details = ec2_launcher.launch_instance(
+        *aws.credentials, user_data='#!/bin/bash\necho hi', warm_pool=True, **LAUNCH
+    )
+
+    assert 'Error' not in details
+    assert 'Launch Path' not in details
+    stats = ec2_launcher.get_warm_pool_stats(*aws.credentials)['Stats']
+    assert stats['hits'] == stats['misses'] == 0
+
+def test_drain_reaches_members_this_process_did_not_configure(aws):
+    profile_id = ec2_launcher.warm_profile_id(**LAUNCH)
+    # Left behind by an earlier process: tagged, stopped, and unknown to this pool
+    orphans = aws.run_instances(count=2, tags={ec2_launcher.WARM_POOL_TAG: profile_id})
+    aws.ec2.stop_instances(InstanceIds=orphans)
+    assert _wait_until(lambda: all(aws.state(i) == 'stopped' for i in orphans))
+
+    stats = ec2_launcher.get_warm_pool_stats(*aws.credentials)
+    assert stats['Instances'] == 2
+    assert stats['Profiles'][profile_id] == {'Target': 0, 'Ready': 2, 'Warming': 0}
+
+    assert ec2_launcher.drain_warm_pool(*aws.credentials) == 2
+    assert all(aws.state(i) in ('shutting-down', 'terminated') for i in orphans)
+
+def test_claim_that_cannot_remove_pool_tag_is_not_handed_out(aws, monkeypatch):
+    monkeypatch.setattr(ec2_launcher, 'WARM_POOL_UNTAG_BACKOFF', 0)
+    profile_id = ec2_launcher.warm_profile_id(**LAUNCH)
+    instance_id, = aws.run_instances(tags={ec2_launcher.WARM_POOL_TAG: profile_id})
+    aws.ec2.stop_instances(InstanceIds=[instance_id])
+    assert _wait_until(lambda: aws.state(instance_id) == 'stopped')
+    attempts = []
+
+    def deny(**kwargs):
+        attempts.append(1)
+        raise ClientError({'Error': {'Code': 'UnauthorizedOperation', 'Message': 'denied'}}, 'DeleteTags')
+
+    aws.hook('before-call.ec2.DeleteTags', deny)
+
+    claimed, errors = ec2_launcher.get_warm_pool(*aws.credentials).claim(profile_id, 1)
+
+    assert claimed == []
+    assert len(attempts) == ec2_launcher.WARM_POOL_UNTAG_ATTEMPTS
+    assert errors and 'denied' in errors[0]
+    assert aws.state(instance_id) in ('stopping', 'stopped')